@@ -1,8 +1,14 @@
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any
 import google.generativeai as genai
 import pandas as pd
+from prompt_builder import build_prompt, estimate_tokens, record_call, MAX_STOCK_ROWS, DEFAULT_TOKEN_BUDGET
+from diversification import get_sector, describe_basket
+from profiling import profiled
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +22,101 @@ genai.configure(api_key=GEMINI_API_KEY)
 # Initialize Gemini model
 model = genai.GenerativeModel('gemini-2.0-flash')
 
+# Seconds allowed for one Gemini request in the async pipeline
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "90"))
+
+ERROR_PREFIX = "Error getting AI recommendations"
+
+# Prompts estimated above this share of the token budget are counted exactly before sending
+EXACT_COUNT_THRESHOLD = float(os.getenv("EXACT_COUNT_THRESHOLD", "0.8"))
+
+@profiled
+def build_recommendation_prompt(
+    risk_profile: str,
+    kmi30_data: pd.DataFrame,
+    user_answers: Dict[str, int]
+) -> Dict[str, Any]:
+    """
+    Select candidate stocks for the risk profile and build the Gemini prompt
+    Returns: Output of build_prompt
+    """
+    # Filter stocks based on risk profile
+    if risk_profile == "conservative":
+        filtered_stocks = kmi30_data[kmi30_data['Summary'].isin(['STRONG_BUY', 'BUY'])]
+    elif risk_profile == "moderate":
+        filtered_stocks = kmi30_data[kmi30_data['Summary'].isin(['STRONG_BUY', 'BUY', 'NEUTRAL'])]
+    else:  # aggressive
+        filtered_stocks = kmi30_data[kmi30_data['Summary'].isin(['STRONG_BUY', 'BUY', 'NEUTRAL', 'SELL'])]
+
+    # Sort stocks by technical indicators
+    filtered_stocks = filtered_stocks.sort_values(by=['RSI', 'MACD'], ascending=[False, False])
+
+    # Prepare stock data for analysis
+    stock_data = filtered_stocks.head(MAX_STOCK_ROWS).to_dict('records')
+    for stock in stock_data:
+        stock['Sector'] = get_sector(stock['Ticker'])
+
+    # Build a prompt that fits the token budget
+    user_profile = {
+        'Investment Goal': get_investment_goal(user_answers),
+        'Time Horizon': get_time_horizon(user_answers),
+        'Risk Tolerance': get_risk_tolerance(user_answers),
+        'Investment Experience': get_experience(user_answers),
+        'Investment Capacity': get_capacity(user_answers),
+    }
+    # Describe only the rows that make it into the prompt
+    def describe(stocks):
+        return describe_basket([stock['Ticker'] for stock in stocks])
+    built = build_prompt(risk_profile, user_profile, stock_data, describe=describe)
+
+    built['count_latency'] = 0.0
+    # Counting exactly costs a Gemini round trip; skip it when the estimate is well under budget
+    # (the response's usage metadata reports the exact count afterwards)
+    if built['prompt_tokens'] <= DEFAULT_TOKEN_BUDGET * EXACT_COUNT_THRESHOLD:
+        return built
+
+    start = time.perf_counter()
+    try:
+        exact = count_prompt_tokens(built['prompt'])
+    except Exception as e:
+        print(f"Token count unavailable, using estimate: {e}")
+        built['count_latency'] = time.perf_counter() - start
+        return built
+    if exact > DEFAULT_TOKEN_BUDGET:
+        # Rescale the estimate to this prompt's measured ratio and drop rows until it fits
+        scale = exact / built['prompt_tokens']
+        built = build_prompt(risk_profile, user_profile, stock_data, describe=describe,
+                             count_tokens=lambda text: int(estimate_tokens(text) * scale) + 1)
+        exact = count_prompt_tokens(built['prompt'])
+    built['prompt_tokens'] = exact
+    built['count_latency'] = time.perf_counter() - start
+    return built
+
+@lru_cache(maxsize=256)
+def count_prompt_tokens(prompt: str) -> int:
+    """Count prompt tokens with the model's tokenizer, cached per prompt text"""
+    return model.count_tokens(prompt).total_tokens
+
+def generation_config(built: Dict[str, Any]) -> Any:
+    """Gemini generation settings for a built prompt"""
+    return genai.types.GenerationConfig(
+        temperature=0.7,
+        max_output_tokens=built['preset']['max_output_tokens'],
+        top_p=0.8,
+        top_k=40
+    )
+
+def record_response(response: Any, built: Dict[str, Any], latency: float) -> str:
+    """Record call statistics and return the response text"""
+    # Prefer the token counts reported by the API, fall back to estimates
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None) or built['prompt_tokens']
+    output_tokens = getattr(usage, 'candidates_token_count', None) or estimate_tokens(response.text)
+    record_call(prompt_tokens, output_tokens, latency, built['preset']['name'], built['stock_rows'],
+                count_latency=built.get('count_latency', 0.0))
+    return response.text
+
+@profiled
 def get_stock_recommendations(
     risk_profile: str,
     kmi30_data: pd.DataFrame,
@@ -25,105 +126,44 @@ def get_stock_recommendations(
     Get AI-powered stock recommendations based on user's risk profile and KMI-30 data
     """
     try:
-        # Filter stocks based on risk profile
-        if risk_profile == "conservative":
-            filtered_stocks = kmi30_data[kmi30_data['Summary'].isin(['STRONG_BUY', 'BUY'])]
-        elif risk_profile == "moderate":
-            filtered_stocks = kmi30_data[kmi30_data['Summary'].isin(['STRONG_BUY', 'BUY', 'NEUTRAL'])]
-        else:  # aggressive
-            filtered_stocks = kmi30_data[kmi30_data['Summary'].isin(['STRONG_BUY', 'BUY', 'NEUTRAL', 'SELL'])]
-
-        # Sort stocks by technical indicators
-        filtered_stocks = filtered_stocks.sort_values(by=['RSI', 'MACD'], ascending=[False, False])
-
-        # Prepare stock data for analysis
-        stock_data = filtered_stocks.head(5).to_dict('records')
-        
-        # Create a detailed prompt for the AI
-        prompt = f"""As an Islamic finance expert and AI-driven fund manager, analyze these KMI-30 stocks for a {risk_profile} investor:
-
-User Profile:
-- Investment Goal: {get_investment_goal(user_answers)}
-- Time Horizon: {get_time_horizon(user_answers)}
-- Risk Tolerance: {get_risk_tolerance(user_answers)}
-- Investment Experience: {get_experience(user_answers)}
-- Investment Capacity: {get_capacity(user_answers)}
-
-Top 5 Stocks Based on Technical Analysis:
-{format_stock_data(stock_data)}
-
-Please provide recommendations in both English and Urdu, following these principles:
-
-1. Shariah Compliance:
-   - Business Screening: Ensure companies are not involved in prohibited industries
-   - Financial Ratio Screening: Debt/Total Assets < 33%, Cash+Interest-Bearing Securities/Total Assets < 33%
-   - Non-permissible Income < 5%
-
-2. Smart Beta Strategy Application:
-   - Value: Low P/E or P/B ratios
-   - Momentum: Strong recent price trends
-   - Quality: High profitability (ROE, margin) and low debt
-   - Low Volatility: Low beta or price swings
-   - Size: Consider market capitalization
-
-3. Portfolio Construction:
-   - Diversification across sectors
-   - Limit concentration in any single stock
-   - Consider market fundamentals (Market Cap, P/E, Dividend Yield, ROE, Beta, Volume)
-   - Factor-based weighting (Value: 30%, Quality: 30%, Momentum: 20%, Low Volatility: 20%)
-
-4. Rebalancing Strategy:
-   - Quarterly rebalancing
-   - Trigger rebalancing if:
-     * Asset weight drifts >10% from target
-     * Stock becomes non-compliant
-     * Factor scores change significantly
-   - Consider transaction costs
-
-Format your response as:
-1. Overall Market Analysis
-2. Shariah Compliance Check
-3. Top 3 Stock Recommendations with:
-   - Factor Analysis
-   - Technical Indicators
-   - Risk Assessment
-   - Suggested Portfolio Weight
-4. Diversification Strategy
-5. Rebalancing Recommendations
-6. Risk Management Advice
-
-Focus on stocks that match the user's risk profile while maintaining Shariah compliance and optimal diversification."""
+        built = build_recommendation_prompt(risk_profile, kmi30_data, user_answers)
 
         # Generate response
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=2000,
-                top_p=0.8,
-                top_k=40
-            )
-        )
-        
-        return response.text
+        start = time.perf_counter()
+        response = model.generate_content(built['prompt'], generation_config=generation_config(built))
+        return record_response(response, built, time.perf_counter() - start)
         
     except Exception as e:
-        return f"Error getting AI recommendations: {str(e)}"
-
-def format_stock_data(stocks: List[Dict[str, Any]]) -> str:
-    """Format stock data for the AI prompt"""
-    formatted = []
-    for stock in stocks:
-        formatted.append(f"""
-Stock: {stock['Ticker']}
-Price: {stock['Current Price']}
-Summary: {stock['Summary']}
-RSI: {stock['RSI']}
-MACD: {stock['MACD']} (Signal: {stock['MACD Signal']})
-ADX: {stock['ADX']}
-Volume: {stock['Volume']}
----""")
-    return "\n".join(formatted)
+        return f"{ERROR_PREFIX}: {str(e)}"
+
+async def get_stock_recommendations_async(
+    risk_profile: str,
+    kmi30_data: pd.DataFrame,
+    user_answers: Dict[str, int],
+    timeout: float = GEMINI_TIMEOUT
+) -> str:
+    """
+    Async version of get_stock_recommendations with a request timeout
+    Must run on the shared pipeline loop (async_runner): the Gemini async client
+    binds to the loop it is first used on. Cancelling the caller cancels the request.
+    """
+    try:
+        # Building the prompt counts tokens with a blocking API call, so keep it off the loop
+        built = await asyncio.to_thread(build_recommendation_prompt, risk_profile, kmi30_data, user_answers)
+
+        start = time.perf_counter()
+        if hasattr(model, 'generate_content_async'):
+            request = model.generate_content_async(built['prompt'], generation_config=generation_config(built))
+        else:
+            # Models without an async client (e.g. load-test stand-ins) run in a worker thread
+            request = asyncio.to_thread(model.generate_content, built['prompt'], generation_config=generation_config(built))
+        response = await asyncio.wait_for(request, timeout)
+        return record_response(response, built, time.perf_counter() - start)
+
+    except asyncio.TimeoutError:
+        return f"{ERROR_PREFIX}: Gemini did not respond within {timeout:.0f}s"
+    except Exception as e:
+        return f"{ERROR_PREFIX}: {str(e)}"
 
 def get_investment_goal(answers: Dict[str, int]) -> str:
     """Get investment goal from user answers"""
@@ -0,0 +1,298 @@
+import re
+import json
+import time
+import threading
+import itertools
+from collections import defaultdict, deque
+from typing import Dict, Any, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from diversification import base_symbol
+
+# Analysis columns that alert rules can reference
+NUMERIC_COLUMNS = ['RSI', 'MACD', 'MACD Signal', 'ADX', 'Volume', 'Current Price']
+SUMMARY_VALUES = ['STRONG_BUY', 'BUY', 'NEUTRAL', 'SELL', 'STRONG_SELL']
+
+COMPARISONS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+CROSSES = ['crosses above', 'crosses below']
+
+# Longest names first so "MACD Signal" wins over "MACD"
+_COLUMN_PATTERN = "|".join(re.escape(c) for c in sorted(NUMERIC_COLUMNS + ['Summary'], key=len, reverse=True))
+_OPERATOR_PATTERN = "|".join(re.escape(o) for o in CROSSES + sorted(COMPARISONS, key=len, reverse=True))
+_CONDITION = re.compile(rf"^\s*({_COLUMN_PATTERN})\s*({_OPERATOR_PATTERN})\s*(.+?)\s*$", re.IGNORECASE)
+
+_CANONICAL_COLUMNS = {c.lower(): c for c in NUMERIC_COLUMNS + ['Summary']}
+
+
+def parse_rule(expression: str) -> List[Tuple[str, str, Any]]:
+    """
+    Parse an alert expression into conditions
+    Args: expression - Conditions joined by "and", e.g. "RSI < 30 and MACD crosses above MACD Signal"
+    Returns: List of (column, operator, operand) tuples; operand is a number, column name or summary value
+    """
+    conditions = []
+    for part in re.split(r"\s+and\s+", expression.strip(), flags=re.IGNORECASE):
+        match = _CONDITION.match(part)
+        if not match:
+            raise ValueError(f"Cannot parse condition '{part}'. Example: RSI < 30 and MACD crosses above MACD Signal")
+        column = _CANONICAL_COLUMNS[match.group(1).lower()]
+        operator = match.group(2).lower()
+        operand = match.group(3)
+
+        if column == 'Summary':
+            value = operand.strip("'\"").upper().replace(' ', '_')
+            if operator not in ('==', '!=') or value not in SUMMARY_VALUES:
+                raise ValueError(f"Summary only supports == or != with one of {', '.join(SUMMARY_VALUES)}")
+            conditions.append((column, operator, value))
+        elif operand.lower() in _CANONICAL_COLUMNS and operand.lower() != 'summary':
+            conditions.append((column, operator, _CANONICAL_COLUMNS[operand.lower()]))
+        elif operator in CROSSES:
+            raise ValueError(f"'{operator}' needs another column, e.g. MACD {operator} MACD Signal")
+        else:
+            try:
+                conditions.append((column, operator, float(operand.replace(',', ''))))
+            except ValueError:
+                raise ValueError(f"'{operand}' is not a number or a known column")
+    return conditions
+
+
+class LocalNotificationSink:
+    """
+    Keeps the most recent notifications per user in memory and optionally appends them to a JSONL file
+    """
+
+    def __init__(self, path: Optional[str] = None, max_per_user: int = 50):
+        self.path = path
+        self._lock = threading.Lock()
+        self._notifications: Dict[str, deque] = defaultdict(lambda: deque(maxlen=max_per_user))
+
+    def deliver(self, notifications: List[Dict[str, Any]]) -> None:
+        if not notifications:
+            return
+        with self._lock:
+            for notification in notifications:
+                self._notifications[notification['user_id']].append(notification)
+            if self.path:
+                with open(self.path, 'a') as f:
+                    for notification in notifications:
+                        f.write(json.dumps(notification) + "\n")
+
+    def get(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get a user's notifications, newest first"""
+        with self._lock:
+            return list(reversed(self._notifications.get(user_id, ())))
+
+    def remove(self, user_id: str) -> None:
+        """Forget a user's notifications"""
+        with self._lock:
+            self._notifications.pop(user_id, None)
+
+
+class AlertEngine:
+    """
+    Evaluates every user's alert rules against a data snapshot in one vectorized pass
+
+    All conditions of all rules are compiled into flat arrays. Evaluation builds
+    a (conditions x tickers) boolean matrix with NumPy broadcasting, reduces it
+    to (rules x tickers) with logical AND and applies per-rule watchlists.
+    Users are only notified when a rule starts matching a ticker.
+    """
+
+    def __init__(self, sink: Optional[LocalNotificationSink] = None):
+        self.sink = sink or LocalNotificationSink()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._rules: Dict[int, Dict[str, Any]] = {}
+        self._compiled: Optional[Dict[str, Any]] = None
+        self._previous: Optional[pd.DataFrame] = None
+        self._active: Set[Tuple[int, str]] = set()
+        self.last_version: Optional[str] = None
+
+    def add_rule(self, user_id: str, expression: str, tickers: Optional[List[str]] = None) -> int:
+        """
+        Register an alert rule
+        Args: user_id - Owner of the rule
+              expression - Alert expression (see parse_rule)
+              tickers - Optional watchlist ('LUCK' or 'LUCK.KAR'); the rule applies to all tickers if omitted
+        Returns: Rule ID
+        """
+        conditions = parse_rule(expression)
+        # Snapshot tickers are matched without their exchange suffix
+        watchlist = [base_symbol(t.strip()) for t in tickers or () if t.strip()]
+        with self._lock:
+            rule_id = next(self._ids)
+            self._rules[rule_id] = {
+                'user_id': user_id,
+                'expression': expression.strip(),
+                'conditions': conditions,
+                'tickers': watchlist or None,
+            }
+            self._compiled = None
+        return rule_id
+
+    def remove_rule(self, rule_id: int) -> None:
+        with self._lock:
+            if self._rules.pop(rule_id, None) is not None:
+                self._compiled = None
+                self._active = {(r, t) for r, t in self._active if r != rule_id}
+
+    def remove_user(self, user_id: str) -> None:
+        """Drop a user's rules and notifications, e.g. when their session ends"""
+        with self._lock:
+            rule_ids = {r for r, rule in self._rules.items() if rule['user_id'] == user_id}
+            if rule_ids:
+                for rule_id in rule_ids:
+                    del self._rules[rule_id]
+                self._compiled = None
+                self._active = {(r, t) for r, t in self._active if r not in rule_ids}
+        self.sink.remove(user_id)
+
+    def get_rules(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{'rule_id': rule_id, 'expression': rule['expression'], 'tickers': rule['tickers']}
+                    for rule_id, rule in self._rules.items() if rule['user_id'] == user_id]
+
+    def _compile(self) -> Dict[str, Any]:
+        rule_ids = list(self._rules)
+        columns = {c: i for i, c in enumerate(NUMERIC_COLUMNS)}
+        summaries = {s: i for i, s in enumerate(SUMMARY_VALUES)}
+
+        groups = defaultdict(lambda: defaultdict(list))
+        starts = []
+        position = 0
+        for rule_index, rule_id in enumerate(rule_ids):
+            starts.append(position)
+            for column, operator, operand in self._rules[rule_id]['conditions']:
+                if column == 'Summary':
+                    group = groups[('summary', operator)]
+                    group['code'].append(summaries[operand])
+                elif isinstance(operand, str):
+                    kind = 'cross' if operator in CROSSES else 'column'
+                    group = groups[(kind, operator)]
+                    group['left'].append(columns[column])
+                    group['right'].append(columns[operand])
+                else:
+                    group = groups[('constant', operator)]
+                    group['left'].append(columns[column])
+                    group['threshold'].append(operand)
+                group['row'].append(position)
+                position += 1
+
+        watch_rules, watch_tickers = [], []
+        for rule_index, rule_id in enumerate(rule_ids):
+            for ticker in self._rules[rule_id]['tickers'] or ():
+                watch_rules.append(rule_index)
+                watch_tickers.append(ticker)
+
+        return {
+            'rule_ids': np.array(rule_ids, dtype=np.int64),
+            'starts': np.array(starts, dtype=np.int64),
+            'conditions': position,
+            'groups': {key: {k: np.array(v) for k, v in group.items()} for key, group in groups.items()},
+            'watched': np.array([self._rules[r]['tickers'] is not None for r in rule_ids], dtype=bool),
+            'watch_rules': np.array(watch_rules, dtype=np.int64),
+            'watch_tickers': np.array(watch_tickers, dtype=object),
+        }
+
+    @staticmethod
+    def _values(df: pd.DataFrame) -> np.ndarray:
+        # 'N/A' and other non-numeric cells become NaN, which never satisfies a comparison
+        return np.vstack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64) for c in NUMERIC_COLUMNS])
+
+    def evaluate(self, snapshot: pd.DataFrame, version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Evaluate all rules against a snapshot and deliver new matches to the sink
+        Args: snapshot - KMI analysis DataFrame
+              version - Snapshot version ID; evaluating the same version twice is a no-op
+        Returns: Notifications delivered by this call
+        """
+        with self._lock:
+            if version is not None and version == self.last_version:
+                return []
+            self.last_version = version
+            if self._compiled is None:
+                self._compiled = self._compile()
+            compiled = self._compiled
+
+            tickers = snapshot['Ticker'].astype(str).str.replace('.KAR', '', regex=False).to_numpy()
+            # Ticker lookups need unique tickers; the last row for a ticker wins
+            unique = ~pd.Series(tickers).duplicated(keep='last').to_numpy()
+            if not unique.all():
+                snapshot, tickers = snapshot[unique], tickers[unique]
+            previous = self._previous
+            self._previous = snapshot
+            if len(compiled['rule_ids']) == 0 or len(tickers) == 0:
+                self._active = set()
+                return []
+
+            values = self._values(snapshot)
+            if previous is not None:
+                # Align the previous snapshot to the current tickers for crossover rules
+                previous_tickers = previous['Ticker'].astype(str).str.replace('.KAR', '', regex=False)
+                unique = ~previous_tickers.duplicated().to_numpy()
+                aligned = previous[unique].set_index(previous_tickers[unique].to_numpy()).reindex(tickers)
+                previous_values = self._values(aligned)
+            else:
+                previous_values = np.full_like(values, np.nan)
+            summary_codes = snapshot['Summary'].map({s: i for i, s in enumerate(SUMMARY_VALUES)}).fillna(-1).to_numpy()
+
+            matrix = np.zeros((compiled['conditions'], len(tickers)), dtype=bool)
+            for (kind, operator), group in compiled['groups'].items():
+                if kind == 'constant':
+                    result = COMPARISONS[operator](values[group['left']], group['threshold'][:, None])
+                elif kind == 'column':
+                    result = COMPARISONS[operator](values[group['left']], values[group['right']])
+                elif kind == 'cross':
+                    now = values[group['left']] - values[group['right']]
+                    before = previous_values[group['left']] - previous_values[group['right']]
+                    if operator == 'crosses above':
+                        result = (before <= 0) & (now > 0)
+                    else:
+                        result = (before >= 0) & (now < 0)
+                else:
+                    result = COMPARISONS[operator](summary_codes[None, :], group['code'][:, None])
+                matrix[group['row']] = result
+
+            # A rule matches a ticker when all of its conditions do
+            matches = np.logical_and.reduceat(matrix, compiled['starts'], axis=0)
+
+            # Restrict rules with a watchlist to their tickers
+            if compiled['watched'].any():
+                allowed = np.zeros_like(matches)
+                allowed[~compiled['watched']] = True
+                columns = pd.Index(tickers).get_indexer(compiled['watch_tickers'])
+                found = columns >= 0
+                allowed[compiled['watch_rules'][found], columns[found]] = True
+                matches &= allowed
+
+            rule_rows, ticker_columns = np.nonzero(matches)
+            active = set(zip(compiled['rule_ids'][rule_rows].tolist(), tickers[ticker_columns].tolist()))
+            new_matches = active - self._active
+            self._active = active
+
+            now = time.time()
+            notifications = []
+            for rule_id, ticker in sorted(new_matches):
+                rule = self._rules[rule_id]
+                notifications.append({
+                    'user_id': rule['user_id'],
+                    'rule_id': rule_id,
+                    'ticker': ticker,
+                    'expression': rule['expression'],
+                    'snapshot_version': version,
+                    'timestamp': now,
+                })
+
+        self.sink.deliver(notifications)
+        return notifications
+
+
+# Shared by every session in this process
+alert_engine = AlertEngine()
@@ -1,16 +1,28 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import random
-from typing import List, Dict, Any
+from typing import Dict, Any
 import requests
 from bs4 import BeautifulSoup
 import re
 from tradingview_ta import TA_Handler, Interval
-from kmi30_data import get_kmi30_analysis
-from ai_agent import get_stock_recommendations
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from pipeline import run_assessment, StageTimeout, AI_CACHE_TTL
+from smart_beta import strategies, SmartBetaEngine
+from alerts import alert_engine
+from diversification import correlation_tracker
+from monte_carlo import simulate_strategy, HORIZON_YEARS
+from fundamentals import load_fundamentals
+from export import FORMATS, get_kmi30_export, get_rankings_export
+from snapshot_store import store
+from shared_cache import shared_cache
+from profiling import profile, profile_store, PROFILING_TOKEN
+from results_view import get_results_view, style_page, COLUMN_CONFIG
 import asyncio
 import os
+import hmac
+from contextlib import nullcontext
 
 # Set page configuration
 st.set_page_config(
@@ -33,10 +45,11 @@ if 'risk_profile' not in st.session_state:
     st.session_state.risk_profile = None
 if 'analysis_df' not in st.session_state:
     st.session_state.analysis_df = None
-if 'kmi30_data' not in st.session_state:
-    st.session_state.kmi30_data = None
-if 'ai_recommendations' not in st.session_state:
-    st.session_state.ai_recommendations = None
+# Large results live in the shared snapshot store; sessions only keep version IDs
+if 'kmi30_data_version' not in st.session_state:
+    st.session_state.kmi30_data_version = None
+if 'ai_recommendations_version' not in st.session_state:
+    st.session_state.ai_recommendations_version = None
 
 # Risk assessment questions
 risk_questions = [
@@ -92,140 +105,76 @@ risk_questions = [
     }
 ]
 
-# Smart beta strategies
-strategies = [
-    {
-        'name': "Quality",
-        'description': "High-quality companies with strong fundamentals",
-        'factors': ["quality"],
-        'riskProfile': "conservative",
-        'expectedReturn': 8.5,
-        'expectedVolatility': 12.0
-    },
-    {
-        'name': "Value",
-        'description': "Undervalued companies trading below intrinsic value",
-        'factors': ["value"],
-        'riskProfile': "moderate",
-        'expectedReturn': 9.2,
-        'expectedVolatility': 15.5
-    },
-    {
-        'name': "Momentum",
-        'description': "Companies with strong price momentum",
-        'factors': ["momentum"],
-        'riskProfile': "aggressive",
-        'expectedReturn': 11.0,
-        'expectedVolatility': 18.0
-    },
-    {
-        'name': "Growth",
-        'description': "Companies with high growth potential",
-        'factors': ["growth"],
-        'riskProfile': "aggressive",
-        'expectedReturn': 12.5,
-        'expectedVolatility': 20.0
-    },
-    {
-        'name': "Low Volatility",
-        'description': "Stable companies with lower price volatility",
-        'factors': ["lowVolatility"],
-        'riskProfile': "conservative",
-        'expectedReturn': 7.8,
-        'expectedVolatility': 9.5
-    },
-    {
-        'name': "Quality Value",
-        'description': "High-quality companies at attractive valuations",
-        'factors': ["quality", "value"],
-        'riskProfile': "moderate",
-        'expectedReturn': 9.8,
-        'expectedVolatility': 13.5
-    },
-    {
-        'name': "Quality Momentum",
-        'description': "High-quality companies with positive momentum",
-        'factors': ["quality", "momentum"],
-        'riskProfile': "moderate",
-        'expectedReturn': 10.5,
-        'expectedVolatility': 14.8
-    }
-]
+# Alert rules are per session, so drop them when the session is released or expires
+store.add_release_listener(alert_engine.remove_user)
 
-class SmartBetaEngine:
-    def __init__(self):
-        self.stocks = self._generate_mock_stocks()
-    
-    def _generate_mock_stocks(self) -> List[Dict[str, Any]]:
-        stocks = []
-        for i in range(50):
-            stock = {
-                'symbol': f'STK{i+1:03d}',
-                'name': f'Company {i+1}',
-                'roe': random.uniform(5, 25),
-                'pe_ratio': random.uniform(5, 30),
-                'pb_ratio': random.uniform(0.5, 5),
-                'revenue_growth': random.uniform(-10, 30),
-                'momentum': random.uniform(-20, 40),
-                'volatility': random.uniform(5, 30)
-            }
-            stocks.append(stock)
-        return stocks
-    
-    def calculate_quality_score(self, stock: Dict[str, Any]) -> float:
-        roe_score = min(100, max(0, (stock['roe'] - 5) * 5))
-        return roe_score
-    
-    def calculate_value_score(self, stock: Dict[str, Any]) -> float:
-        pe_score = min(100, max(0, (30 - stock['pe_ratio']) * 4))
-        pb_score = min(100, max(0, (5 - stock['pb_ratio']) * 20))
-        return (pe_score + pb_score) / 2
-    
-    def calculate_momentum_score(self, stock: Dict[str, Any]) -> float:
-        return min(100, max(0, (stock['momentum'] + 20) * 1.67))
-    
-    def calculate_growth_score(self, stock: Dict[str, Any]) -> float:
-        return min(100, max(0, (stock['revenue_growth'] + 10) * 2.5))
-    
-    def calculate_low_volatility_score(self, stock: Dict[str, Any]) -> float:
-        return min(100, max(0, (30 - stock['volatility']) * 4))
+def get_session_id() -> str:
+    """Get the ID of the current Streamlit session"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "default"
+
+def set_session_snapshot(slot: str, value: Any) -> None:
+    """Store a value in the shared snapshot store and reference it from this session"""
+    version = store.put(value)
+    store.acquire(get_session_id(), slot, version)
+    st.session_state[f"{slot}_version"] = version
+    # Publish the snapshot so other workers can serve it by version ID
+    if shared_cache.get_object(f"snapshot:{version}") is None:
+        shared_cache.set_object(f"snapshot:{version}", value, ttl=AI_CACHE_TTL)
+
+def get_session_snapshot(slot: str) -> Any:
+    """Get the shared snapshot referenced by this session, or None if missing or evicted"""
+    version = st.session_state.get(f"{slot}_version")
+    value = store.get(version)
+    if value is None and version is not None:
+        # Evicted locally or created by another worker
+        value = shared_cache.get_object(f"snapshot:{version}")
+        if value is not None:
+            store.put(value)
+            store.acquire(get_session_id(), slot, version)
+    return value
+
+def session_abandoned() -> bool:
+    """Check whether the browser session running this script has disconnected"""
+    ctx = get_script_run_ctx()
+    if ctx is None or not runtime.exists():
+        return False
+    return not runtime.get_instance().is_active_session(ctx.session_id)
+
+def profiling_enabled() -> bool:
+    """Check whether an admin turned on profiling for this session with ?profile=<PROFILING_TOKEN>"""
+    if not PROFILING_TOKEN:
+        return False
+    token = st.query_params.get('profile')
+    # Compare bytes: compare_digest raises TypeError on non-ASCII str
+    if token and hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode()):
+        st.session_state.profiling = True
+    return st.session_state.get('profiling', False)
+
+def display_profiling() -> None:
+    """Sidebar controls for a profiled session"""
+    st.markdown("---")
+    st.markdown("### Profiling")
+    captures = profile_store.recent(get_session_id()[:8])
+    st.caption(f"Every rerun of this session is profiled ({len(captures)} captures kept)")
+    if captures:
+        with open(captures[0], 'rb') as f:
+            st.download_button("⬇️ Latest capture (speedscope)", f.read(),
+                               file_name=os.path.basename(captures[0]), mime="application/json")
+    if st.button("Stop profiling", key="stop_profiling"):
+        st.session_state.profiling = False
+        st.query_params.pop('profile', None)
+        st.rerun()
+
+def on_kmi30_analysis(kmi30_data: pd.DataFrame, closes: pd.DataFrame) -> None:
+    """Store a fresh KMI-30 snapshot and run the per-snapshot updates"""
+    set_session_snapshot('kmi30_data', kmi30_data)
     
-    def get_stock_recommendations(self, risk_profile: str, num_recommendations: int = 10) -> List[Dict[str, Any]]:
-        # Filter strategies based on risk profile
-        suitable_strategies = [s for s in strategies if s['riskProfile'] == risk_profile]
-        
-        # Calculate scores for each stock
-        scored_stocks = []
-        for stock in self.stocks:
-            scores = {}
-            for strategy in suitable_strategies:
-                strategy_score = 0
-                for factor in strategy['factors']:
-                    if factor == 'quality':
-                        strategy_score += self.calculate_quality_score(stock)
-                    elif factor == 'value':
-                        strategy_score += self.calculate_value_score(stock)
-                    elif factor == 'momentum':
-                        strategy_score += self.calculate_momentum_score(stock)
-                    elif factor == 'growth':
-                        strategy_score += self.calculate_growth_score(stock)
-                    elif factor == 'lowVolatility':
-                        strategy_score += self.calculate_low_volatility_score(stock)
-                
-                strategy_score /= len(strategy['factors'])
-                scores[strategy['name']] = strategy_score
-            
-            # Find best strategy for this stock
-            best_strategy = max(scores.items(), key=lambda x: x[1])
-            scored_stocks.append({
-                'stock': stock,
-                'strategy': best_strategy[0],
-                'score': best_strategy[1]
-            })
-        
-        # Sort by score and return top recommendations
-        scored_stocks.sort(key=lambda x: x['score'], reverse=True)
-        return scored_stocks[:num_recommendations]
+    # Check every user's alert rules against the new snapshot
+    alert_engine.evaluate(kmi30_data, st.session_state.kmi30_data_version)
+    # Correlations and price factors come from daily closes, not from the irregular snapshot prices
+    correlation_tracker.load_history(closes)
+    get_smart_beta_engine().update_from_closes(closes)
 
 def calculate_risk_profile(answers: Dict[str, int]) -> str:
     total_points = sum(answers.values())
@@ -450,7 +399,71 @@ def analyze_kmi30_stocks():
     
     return df
 
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_strategy_simulation(strategy_name: str, years: int) -> Dict[str, Any]:
+    """Simulate a strategy once per horizon, shared across sessions"""
+    strategy = next(s for s in strategies if s['name'] == strategy_name)
+    return simulate_strategy(strategy, years=years)
+
+@st.cache_resource(show_spinner=False)
+def _smart_beta_engine(table_id: int, _table: Any) -> SmartBetaEngine:
+    return SmartBetaEngine(_table)
+
+def get_smart_beta_engine() -> SmartBetaEngine:
+    """Get the process-wide engine for the current fundamentals table"""
+    table = load_fundamentals()
+    return _smart_beta_engine(id(table), table)
+
+def display_downloads(name: str, get_export: Any):
+    """Show download buttons for each export format, served from the export cache"""
+    cols = st.columns(len(FORMATS))
+    for col, fmt in zip(cols, FORMATS):
+        buffer = get_export(fmt)
+        if buffer is None:
+            continue
+        with col:
+            st.download_button(
+                f"⬇️ {fmt.upper()}",
+                data=buffer,
+                file_name=f"{name}.{fmt}",
+                mime=FORMATS[fmt],
+                key=f"download_{name}_{fmt}"
+            )
+
+def display_alerts():
+    """Let the user manage alert rules and see triggered alerts"""
+    user_id = get_session_id()
+    with st.expander("🔔 Alerts"):
+        st.markdown(
+            "Get notified when a condition becomes true on a data refresh, e.g. "
+            "`RSI < 30` or `MACD crosses above MACD Signal and Summary == BUY`."
+        )
+        expression = st.text_input("Alert rule", key="alert_expression")
+        watchlist = st.text_input("Tickers (optional, comma separated)", key="alert_tickers")
+        if st.button("Add Alert", key="add_alert") and expression:
+            tickers = [t.strip() for t in watchlist.split(",") if t.strip()] or None
+            try:
+                alert_engine.add_rule(user_id, expression, tickers)
+            except ValueError as e:
+                st.error(str(e))
+        
+        for rule in alert_engine.get_rules(user_id):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                tickers_text = f" ({', '.join(rule['tickers'])})" if rule['tickers'] else ""
+                st.markdown(f"`{rule['expression']}`{tickers_text}")
+            with col2:
+                if st.button("Remove", key=f"remove_alert_{rule['rule_id']}"):
+                    alert_engine.remove_rule(rule['rule_id'])
+                    st.rerun()
+        
+        for notification in alert_engine.sink.get(user_id)[:10]:
+            st.info(f"{notification['ticker']}: {notification['expression']}")
+
 def main():
+    # Keep this session's snapshot references alive
+    store.touch(get_session_id())
+
     # Create sidebar
     with st.sidebar:
         st.image("https://img.icons8.com/color/96/000000/mosque.png", width=80)
@@ -473,9 +486,17 @@ def main():
             st.markdown(f"### Your Profile")
             st.markdown(f"<div class='risk-badge {risk_color}'>{st.session_state.risk_profile.capitalize()}</div>", unsafe_allow_html=True)
             
+            footprint = store.session_footprint(get_session_id())
+            st.caption(f"Session memory: {footprint['amortized_bytes'] / 1024:.1f} KB "
+                       f"({footprint['referenced_bytes'] / 1024:.1f} KB shared)")
+            
             if st.button("🔄 Start Over", key="sidebar_reset"):
+                store.release_session(get_session_id())
                 st.session_state.clear()
                 st.rerun()
+        
+        if st.session_state.get('profiling'):
+            display_profiling()
     
     # Main content area
     st.markdown("<h1>Investment Risk Assessment & Smart Beta Recommendations</h1>", unsafe_allow_html=True)
@@ -526,15 +547,19 @@ def main():
                                 # Calculate risk profile
                                 st.session_state.risk_profile = calculate_risk_profile(st.session_state.answers)
                                 
-                                # Fetch KMI-30 data
-                                st.session_state.kmi30_data = get_kmi30_analysis()
-                                
-                                # Get AI recommendations
-                                st.session_state.ai_recommendations = get_stock_recommendations(
-                                    st.session_state.risk_profile,
-                                    st.session_state.kmi30_data,
-                                    st.session_state.answers
-                                )
+                                # Fetch KMI-30 data, then AI recommendations, on the async pipeline
+                                try:
+                                    _, recommendations = run_assessment(
+                                        st.session_state.risk_profile,
+                                        st.session_state.answers,
+                                        on_analysis=on_kmi30_analysis,
+                                        is_cancelled=session_abandoned
+                                    )
+                                except StageTimeout as e:
+                                    recommendations = f"Error getting AI recommendations: {e}"
+                                except asyncio.CancelledError:
+                                    st.stop()
+                                set_session_snapshot('ai_recommendations', recommendations)
                             st.rerun()
         else:
             # Results phase
@@ -564,42 +589,52 @@ def main():
             
             with tab1:
                 # Display KMI-30 data
-                if st.session_state.kmi30_data is not None:
+                kmi30_data = get_session_snapshot('kmi30_data')
+                if kmi30_data is not None:
                     st.markdown("<h3>KMI-30 Technical Analysis</h3>", unsafe_allow_html=True)
                     
-                    # Style the dataframe
+                    # Reuse the precomputed view for this data snapshot
+                    view = get_results_view(
+                        st.session_state.kmi30_data_version,
+                        kmi30_data
+                    )
+
+                    page = 1
+                    if view['pages'] > 1:
+                        page = st.number_input("Page", min_value=1, max_value=view['pages'], value=1, key="results_page")
+
                     st.dataframe(
-                        st.session_state.kmi30_data.style.apply(
-                            lambda x: ['background-color: #dcfce7' if v == 'STRONG_BUY' else
-                                      'background-color: #d1fae5' if v == 'BUY' else
-                                      'background-color: #fef9c3' if v == 'NEUTRAL' else
-                                      'background-color: #fee2e2' if v == 'SELL' else
-                                      'background-color: #fecaca' if v == 'STRONG_SELL' else ''
-                                      for v in x], subset=['Summary']
-                        ),
+                        style_page(view, page),
+                        column_config=COLUMN_CONFIG,
                         use_container_width=True
                     )
                     
                     # Display recommendations summary
                     st.markdown("<h3>KMI-30 Summary</h3>", unsafe_allow_html=True)
-                    recommendations = st.session_state.kmi30_data['Summary'].value_counts()
+                    recommendations = view['summary_counts']
                     
                     # Create columns for recommendation counts
-                    cols = st.columns(len([r for r in recommendations.items() if r[0] != 'N/A']))
-                    
-                    i = 0
-                    for rec, count in recommendations.items():
-                        if rec != 'N/A':
+                    if recommendations:
+                        cols = st.columns(len(recommendations))
+                        for i, (rec, count) in enumerate(recommendations):
                             with cols[i]:
                                 st.markdown(f"<div class='recommendation-item {rec}'><h4>{rec}</h4><p style='font-size: 1.5rem; font-weight: bold;'>{count}</p></div>", unsafe_allow_html=True)
-                            i += 1
+                elif st.session_state.kmi30_data_version is not None:
+                    st.warning("This analysis has expired. Please use Start Over to run a fresh assessment.")
+                
+                if kmi30_data is not None:
+                    display_downloads("kmi30", lambda fmt: get_kmi30_export(st.session_state.kmi30_data_version, fmt))
+                    st.caption(f"Snapshot version: {st.session_state.kmi30_data_version}")
+                
+                display_alerts()
             
             with tab2:
                 # Display AI recommendations
-                if st.session_state.ai_recommendations:
+                ai_recommendations = get_session_snapshot('ai_recommendations')
+                if ai_recommendations:
                     st.markdown("<h3>AI-Powered Recommendations</h3>", unsafe_allow_html=True)
                     st.markdown("<div class='result-card'>", unsafe_allow_html=True)
-                    st.markdown(st.session_state.ai_recommendations, unsafe_allow_html=True)
+                    st.markdown(ai_recommendations, unsafe_allow_html=True)
                     st.markdown("</div>", unsafe_allow_html=True)
             
             with tab3:
@@ -621,10 +656,30 @@ def main():
                             st.markdown(f"<p><strong>Expected Return:</strong> {strategy['expectedReturn']}%</p>", unsafe_allow_html=True)
                             st.markdown(f"<p><strong>Volatility:</strong> {strategy['expectedVolatility']}%</p>", unsafe_allow_html=True)
                             
+                            # Simulated outcomes over the user's investment horizon
+                            years = HORIZON_YEARS.get(st.session_state.answers.get(2), 10)
+                            simulation = get_strategy_simulation(strategy['name'], years)
+                            terminal = simulation['terminal']
+                            st.markdown(f"<p><strong>{years}-Year Outcome (5th-95th pct):</strong> {terminal[5]:.2f}x - {terminal[95]:.2f}x (median {terminal[50]:.2f}x)</p>", unsafe_allow_html=True)
+                            st.markdown(f"<p><strong>Probability of Loss:</strong> {simulation['probability_of_loss'] * 100:.1f}%</p>", unsafe_allow_html=True)
+                            st.markdown(f"<p><strong>Expected Max Drawdown:</strong> {simulation['expected_max_drawdown'] * 100:.1f}%</p>", unsafe_allow_html=True)
+                            
                             # Add factors used
                             factors_text = ", ".join([f.capitalize() for f in strategy['factors']])
                             st.markdown(f"<p><strong>Factors:</strong> {factors_text}</p>", unsafe_allow_html=True)
                             st.markdown(f"</div>", unsafe_allow_html=True)
+                    
+                    # Full smart beta ranking for this profile
+                    engine = get_smart_beta_engine()
+                    st.markdown("<h3>Smart Beta Rankings</h3>", unsafe_allow_html=True)
+                    if engine.fundamentals.is_placeholder:
+                        # Generated values for real tickers must not pass for real fundamentals
+                        st.info("Rankings are unavailable: no fundamentals data is configured, so only placeholder values exist. See FUNDAMENTALS_PATH in the README.")
+                    else:
+                        display_downloads(
+                            f"rankings-{st.session_state.risk_profile}",
+                            lambda fmt: get_rankings_export(engine, st.session_state.risk_profile, fmt)
+                        )
                 else:
                     st.info("No strategies available for your risk profile. Please complete the assessment again.")
     
@@ -632,4 +687,5 @@ def main():
     st.markdown("<div class='footer'>Sharia Stock Pro © 2025| Powered by AI and Smart Beta Strategies</div>", unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profile(f"rerun-{get_session_id()[:8]}") if profiling_enabled() else nullcontext():
+        main()
\ No newline at end of file
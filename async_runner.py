@@ -0,0 +1,74 @@
+"""
+Process-wide event loop for the async data and AI pipeline
+
+Coroutines run on one long-lived loop in a background thread instead of a
+fresh asyncio.run() per call. Clients that bind to the loop they were first
+used on (such as Gemini's grpc.aio client) keep working, and a caller that
+times out or is cancelled returns immediately. Blocking work started by the
+pipeline runs on the loop's bounded worker pool, so threads left running by
+a timed-out stage never hold up the caller.
+"""
+import os
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Coroutine, Optional
+
+# Worker threads for blocking upstream calls (PSX, TradingView, cache backends)
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "32"))
+
+# How often a waiting caller checks whether it was cancelled
+CANCEL_POLL_INTERVAL = 0.5
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Get the shared pipeline event loop, starting it on first use"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline"))
+            threading.Thread(target=loop.run_forever, name="pipeline-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+async def _in_context(context: contextvars.Context, coro: Coroutine) -> Any:
+    # Run the coroutine as a task in the caller's context (e.g. an active profiler)
+    return await context.run(asyncio.ensure_future, coro)
+
+
+def run(
+    coro: Coroutine,
+    timeout: Optional[float] = None,
+    is_cancelled: Optional[Callable[[], bool]] = None
+) -> Any:
+    """
+    Run a coroutine on the shared loop and wait for its result
+    Args: coro - Coroutine to run
+          timeout - Optional seconds to wait before cancelling it
+          is_cancelled - Polled while waiting; returning True cancels the coroutine
+    Returns: Result of the coroutine
+    Raises: asyncio.TimeoutError on timeout, asyncio.CancelledError if cancelled
+    """
+    future = asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coro), get_loop())
+    deadline = None if timeout is None else get_loop().time() + timeout
+    while True:
+        poll = CANCEL_POLL_INTERVAL if is_cancelled is not None else None
+        if deadline is not None:
+            remaining = deadline - get_loop().time()
+            if remaining <= 0:
+                future.cancel()
+                raise asyncio.TimeoutError()
+            poll = remaining if poll is None else min(poll, remaining)
+        # A stage's own TimeoutError must not be mistaken for this wait expiring
+        done, _ = wait([future], poll)
+        if done:
+            return future.result()
+        if is_cancelled is not None and is_cancelled():
+            future.cancel()
+            raise asyncio.CancelledError()
@@ -0,0 +1,64 @@
+"""
+Benchmark evaluating many users' alert rules against one snapshot
+
+Registers rules for thousands of simulated users and times a single
+AlertEngine.evaluate pass over universes of different sizes.
+
+Run with: python benchmarks/bench_alerts.py
+"""
+import os
+import sys
+import time
+import random
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import AlertEngine
+
+RULE_TEMPLATES = [
+    "RSI < {rsi}",
+    "RSI > {rsi} and ADX > {adx}",
+    "MACD crosses above MACD Signal",
+    "MACD crosses below MACD Signal and Summary == SELL",
+    "Summary == STRONG_BUY and Volume > {volume}",
+]
+
+
+def make_snapshot(rows: int, seed: int) -> pd.DataFrame:
+    """Create a synthetic KMI analysis snapshot"""
+    rng = random.Random(seed)
+    return pd.DataFrame([{
+        'Ticker': f"T{i:04d}.KAR",
+        'Current Price': rng.uniform(10, 500),
+        'Summary': rng.choice(['STRONG_BUY', 'BUY', 'NEUTRAL', 'SELL', 'STRONG_SELL']),
+        'RSI': rng.uniform(10, 90),
+        'MACD': rng.uniform(-5, 5),
+        'MACD Signal': rng.uniform(-5, 5),
+        'ADX': rng.uniform(5, 60),
+        'Volume': rng.uniform(1e4, 1e7),
+    } for i in range(rows)])
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'users':>6} {'rules':>6} {'tickers':>8} {'evaluate ms':>12} {'notifications':>14}")
+    for users, tickers in ((1000, 30), (5000, 30), (5000, 600)):
+        engine = AlertEngine()
+        for user in range(users):
+            for _ in range(2):
+                expression = rng.choice(RULE_TEMPLATES).format(
+                    rsi=rng.randint(20, 80), adx=rng.randint(15, 40), volume=rng.randint(10, 5000) * 1000
+                )
+                watchlist = [f"T{rng.randrange(tickers):04d}" for _ in range(3)] if rng.random() < 0.5 else None
+                engine.add_rule(f"user{user}", expression, watchlist)
+
+        engine.evaluate(make_snapshot(tickers, 1), "v1")
+        start = time.perf_counter()
+        notifications = engine.evaluate(make_snapshot(tickers, 2), "v2")
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{users:>6} {users * 2:>6} {tickers:>8} {elapsed:>12.2f} {len(notifications):>14}")
+
+
+if __name__ == "__main__":
+    main()
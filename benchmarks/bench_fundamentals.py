@@ -0,0 +1,59 @@
+"""
+Benchmark loading the fundamentals table and scoring it with SmartBetaEngine
+
+Writes a synthetic 10,000-symbol table to a temporary directory, then times a
+cold load, a cached load and a full recommendation pass.
+
+Run with: python benchmarks/bench_fundamentals.py
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fundamentals import load_fundamentals, write_fundamentals
+from smart_beta import SmartBetaEngine
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    """Create synthetic fundamentals for a universe of the given size"""
+    rng = np.random.default_rng(rows)
+    return pd.DataFrame({
+        'symbol': [f"S{i:05d}" for i in range(rows)],
+        'name': [f"Company {i}" for i in range(rows)],
+        'roe': rng.uniform(5, 25, rows),
+        'pe_ratio': rng.uniform(5, 30, rows),
+        'pb_ratio': rng.uniform(0.5, 5, rows),
+        'revenue_growth': rng.uniform(-10, 30, rows),
+        'momentum': rng.uniform(-20, 40, rows),
+        'volatility': rng.uniform(5, 30, rows),
+    })
+
+
+def main():
+    with tempfile.TemporaryDirectory() as path:
+        write_fundamentals(make_frame(10000), path)
+
+        start = time.perf_counter()
+        table = load_fundamentals(path)
+        cold = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        load_fundamentals(path)
+        warm = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for profile in ('conservative', 'moderate', 'aggressive'):
+            SmartBetaEngine(table).get_stock_recommendations(profile)
+        scoring = (time.perf_counter() - start) * 1000 / 3
+
+        print(f"symbols: {len(table)}")
+        print(f"cold load: {cold:.2f} ms, cached load: {warm:.3f} ms, recommendations: {scoring:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark incremental rescoring against a full SmartBetaEngine rescore
+
+Scores a synthetic 10,000-symbol universe, then applies an intraday
+momentum/volatility refresh to a small share of symbols and compares the
+patched ranking with a full rescore.
+
+Run with: python benchmarks/bench_incremental_scoring.py
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fundamentals import load_fundamentals, write_fundamentals
+from smart_beta import SmartBetaEngine
+from bench_fundamentals import make_frame
+
+PROFILES = ('conservative', 'moderate', 'aggressive')
+
+
+def main():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as path:
+        write_fundamentals(make_frame(10000), path)
+        table = load_fundamentals(path)
+
+        engine = SmartBetaEngine(table)
+        for profile in PROFILES:
+            engine.get_stock_recommendations(profile)
+
+        all_symbols = table.symbols.tolist()
+        all_momentum = np.array(table['momentum'])
+        all_volatility = np.array(table['volatility'])
+
+        for changed in (10, 100, 1000):
+            rows = rng.choice(len(table), changed, replace=False)
+            symbols = [all_symbols[i] for i in rows]
+            momentum = rng.uniform(-20, 40, changed)
+            volatility = rng.uniform(5, 30, changed)
+            all_momentum[rows] = momentum
+            all_volatility[rows] = volatility
+
+            start = time.perf_counter()
+            engine.update_prices(symbols, momentum=momentum, volatility=volatility)
+            patched = {p: engine.get_stock_recommendations(p) for p in PROFILES}
+            incremental = (time.perf_counter() - start) * 1000
+
+            # Full rescore of every factor and ranking with the same values
+            start = time.perf_counter()
+            full_engine = SmartBetaEngine(table)
+            full_engine.update_prices(all_symbols, momentum=all_momentum, volatility=all_volatility)
+            expected = {p: full_engine.get_stock_recommendations(p) for p in PROFILES}
+            full = (time.perf_counter() - start) * 1000
+
+            same = all(
+                [r['stock']['symbol'] for r in patched[p]] == [r['stock']['symbol'] for r in expected[p]]
+                for p in PROFILES
+            )
+            print(f"changed={changed:>5}: incremental {incremental:.2f} ms, full {full:.2f} ms, same top 10: {same}")
+
+
+if __name__ == "__main__":
+    main()
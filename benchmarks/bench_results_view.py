@@ -0,0 +1,87 @@
+"""
+Benchmark rerun latency of the KMI-30 results page
+
+Compares the original path (Styler with a per-cell lambda plus value_counts on
+every rerun) against the precomputed results view at 30 and 600 rows. The view is keyed by the
+snapshot version, which the snapshot store computes once when a snapshot is
+stored, so it is not part of the per-rerun cost.
+
+Run with: python benchmarks/bench_results_view.py
+"""
+import os
+import sys
+import time
+import random
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_view import build_results_view, style_page
+from snapshot_store import snapshot_version
+
+SUMMARIES = ['STRONG_BUY', 'BUY', 'NEUTRAL', 'SELL', 'STRONG_SELL', 'N/A']
+
+
+def make_snapshot(rows: int) -> pd.DataFrame:
+    """Create a synthetic KMI analysis snapshot"""
+    rng = random.Random(rows)
+    return pd.DataFrame([{
+        'Ticker': f"T{i:04d}.KAR",
+        'Current Price': round(rng.uniform(10, 500), 2),
+        'Summary': rng.choice(SUMMARIES),
+        'RSI': round(rng.uniform(10, 90), 2),
+        'MACD': round(rng.uniform(-5, 5), 2),
+        'MACD Signal': round(rng.uniform(-5, 5), 2) if rng.random() > 0.1 else 'N/A',
+        'ADX': round(rng.uniform(5, 60), 2),
+        'Volume': round(rng.uniform(1e4, 1e7), 2),
+    } for i in range(rows)])
+
+
+def original_rerun(df: pd.DataFrame) -> None:
+    """Work done by the original tab1 code on every rerun"""
+    styler = df.style.apply(
+        lambda x: ['background-color: #dcfce7' if v == 'STRONG_BUY' else
+                   'background-color: #d1fae5' if v == 'BUY' else
+                   'background-color: #fef9c3' if v == 'NEUTRAL' else
+                   'background-color: #fee2e2' if v == 'SELL' else
+                   'background-color: #fecaca' if v == 'STRONG_SELL' else ''
+                   for v in x], subset=['Summary']
+    )
+    styler._compute()
+    df['Summary'].value_counts()
+
+
+def cached_rerun(df: pd.DataFrame, version: str, cache: dict) -> None:
+    """Work done by the precomputed view on every rerun (the version is computed once per snapshot)"""
+    view = cache.get(version)
+    if view is None:
+        view = cache[version] = build_results_view(df)
+    style_page(view, 1)._compute()
+
+
+def timeit(func, repeat: int = 50) -> float:
+    """Get the median runtime of a function in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    print(f"{'rows':>6} {'original ms':>12} {'cold ms':>10} {'warm ms':>10}")
+    for rows in (30, 600):
+        df = make_snapshot(rows)
+        original = timeit(lambda: original_rerun(df))
+        version = snapshot_version(df)
+        cold = timeit(lambda: cached_rerun(df, version, {}))
+        cache = {}
+        cached_rerun(df, version, cache)
+        warm = timeit(lambda: cached_rerun(df, version, cache))
+        print(f"{rows:>6} {original:>12.2f} {cold:>10.2f} {warm:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import threading
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+
+# PSX sector of KMI index constituents
+SECTOR_MAP = {
+    'ATRL': 'Refinery', 'NRL': 'Refinery', 'PRL': 'Refinery',
+    'DGKC': 'Cement', 'LUCK': 'Cement', 'MLCF': 'Cement', 'FCCL': 'Cement', 'CHCC': 'Cement',
+    'KOHC': 'Cement', 'PIOC': 'Cement', 'ACPL': 'Cement', 'BWCL': 'Cement', 'POWER': 'Cement',
+    'EFERT': 'Fertilizer', 'FFC': 'Fertilizer', 'FFBL': 'Fertilizer', 'FATIMA': 'Fertilizer',
+    'ENGRO': 'Fertilizer', 'DAWH': 'Fertilizer',
+    'EPCL': 'Chemical', 'LOTCHEM': 'Chemical', 'LCI': 'Chemical',
+    'MEBL': 'Commercial Banks', 'FABL': 'Commercial Banks', 'BIPL': 'Commercial Banks',
+    'HBL': 'Commercial Banks', 'MCB': 'Commercial Banks', 'UBL': 'Commercial Banks',
+    'OGDC': 'Oil & Gas Exploration', 'PPL': 'Oil & Gas Exploration', 'POL': 'Oil & Gas Exploration',
+    'MARI': 'Oil & Gas Exploration',
+    'PSO': 'Oil & Gas Marketing', 'SNGP': 'Oil & Gas Marketing', 'SSGC': 'Oil & Gas Marketing',
+    'APL': 'Oil & Gas Marketing',
+    'HUBC': 'Power Generation', 'KAPCO': 'Power Generation', 'NPL': 'Power Generation',
+    'SYS': 'Technology', 'TRG': 'Technology', 'AVN': 'Technology', 'NETSOL': 'Technology',
+    'SEARL': 'Pharmaceuticals', 'AGP': 'Pharmaceuticals', 'GLAXO': 'Pharmaceuticals',
+    'ABOT': 'Pharmaceuticals', 'HINOON': 'Pharmaceuticals', 'FEROZ': 'Pharmaceuticals',
+    'INIL': 'Engineering', 'ISL': 'Engineering', 'ASTL': 'Engineering', 'MUGHAL': 'Engineering',
+    'ILP': 'Textile Composite', 'NML': 'Textile Composite', 'NCL': 'Textile Composite',
+    'GATM': 'Textile Composite', 'KTML': 'Textile Composite',
+    'HCAR': 'Automobile Assembler', 'INDU': 'Automobile Assembler', 'PSMC': 'Automobile Assembler',
+    'MTL': 'Automobile Assembler', 'GHNI': 'Automobile Assembler', 'SAZEW': 'Automobile Assembler',
+    'PAEL': 'Cable & Electrical Goods', 'TGL': 'Glass & Ceramics', 'PKGS': 'Paper & Board',
+    'CEPB': 'Paper & Board', 'UNITY': 'Food & Personal Care', 'NATF': 'Food & Personal Care',
+    'FFL': 'Food & Personal Care',
+}
+
+UNCLASSIFIED = 'Unclassified'
+
+# Number of return observations in the rolling correlation window
+DEFAULT_WINDOW = 60
+
+
+def base_symbol(ticker: str) -> str:
+    """Strip the exchange suffix from a ticker (e.g. 'LUCK.KAR' -> 'LUCK')"""
+    return ticker.split('.')[0].upper()
+
+
+def get_sector(ticker: str) -> str:
+    """Get the sector of an index constituent"""
+    return SECTOR_MAP.get(base_symbol(ticker), UNCLASSIFIED)
+
+
+def sector_concentration(basket: Union[Sequence[str], Mapping[str, float]]) -> Dict[str, Any]:
+    """
+    Measure how concentrated a candidate basket is by sector
+    Args: basket - Tickers (equal-weighted) or a mapping of ticker to weight
+    Returns: Dict with sector weights (largest first), the Herfindahl index and the largest sector
+    """
+    weights = dict(basket) if isinstance(basket, Mapping) else {t: 1.0 for t in basket}
+    total = sum(weights.values())
+    if not weights or total <= 0:
+        return {'sectors': {}, 'hhi': 0.0, 'top_sector': None, 'top_weight': 0.0}
+
+    sectors: Dict[str, float] = {}
+    for ticker, weight in weights.items():
+        sector = get_sector(ticker)
+        sectors[sector] = sectors.get(sector, 0.0) + weight / total
+    sectors = dict(sorted(sectors.items(), key=lambda x: x[1], reverse=True))
+    top_sector, top_weight = next(iter(sectors.items()))
+    return {
+        'sectors': sectors,
+        'hhi': float(sum(w * w for w in sectors.values())),
+        'top_sector': top_sector,
+        'top_weight': top_weight,
+    }
+
+
+class RollingCorrelation:
+    """
+    Rolling pairwise return correlation for the whole universe
+
+    Keeps running sums of returns and of their outer products over a ring
+    buffer, so each new observation updates the matrix in O(N^2) instead of
+    recomputing it from the whole window in O(window x N^2). The app fills
+    it from PSX daily closes, so each observation is one trading day.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self.last_version: Optional[Tuple[Any, ...]] = None
+        self.set_universe([])
+
+    def set_universe(self, symbols: Sequence[str]) -> None:
+        """Reset the tracker for a new set of symbols"""
+        self.symbols = [base_symbol(s) for s in symbols]
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self._returns = np.zeros((self.window, n))
+        self._sums = np.zeros(n)
+        self._cross = np.zeros((n, n))
+        self._last_prices = np.full(n, np.nan)
+        self._position = 0
+        self.count = 0
+        self._updates = 0
+
+    def _add_returns(self, returns: np.ndarray) -> None:
+        if self.count == self.window:
+            old = self._returns[self._position]
+            self._sums -= old
+            self._cross -= np.outer(old, old)
+        else:
+            self.count += 1
+        self._returns[self._position] = returns
+        self._sums += returns
+        self._cross += np.outer(returns, returns)
+        self._position = (self._position + 1) % self.window
+
+        # Recompute the running sums once per window to stop floating-point drift
+        self._updates += 1
+        if self._updates % self.window == 0:
+            filled = self._returns if self.count == self.window else self._returns[:self.count]
+            self._sums = filled.sum(axis=0)
+            self._cross = filled.T @ filled
+
+    def add_prices(self, prices: Mapping[str, float]) -> None:
+        """
+        Add one observation of prices; returns are taken against the previous observation
+        Args: prices - Mapping of ticker to price; missing or invalid prices count as unchanged
+        """
+        with self._lock:
+            new_symbols = [base_symbol(t) for t in prices if base_symbol(t) not in self.index]
+            if new_symbols:
+                # A changed universe restarts the window
+                self.set_universe(self.symbols + new_symbols)
+
+            current = self._last_prices.copy()
+            for ticker, price in prices.items():
+                try:
+                    price = float(price)
+                except (TypeError, ValueError):
+                    continue
+                if price > 0:
+                    current[self.index[base_symbol(ticker)]] = price
+
+            previous = self._last_prices
+            self._last_prices = current
+            if np.isnan(previous).all():
+                return
+            returns = np.where(np.isnan(previous) | np.isnan(current), 0.0, current / previous - 1.0)
+            self._add_returns(returns)
+
+    def load_history(self, closes: pd.DataFrame) -> None:
+        """
+        Update the window from a series of periodic closing prices, once per history
+        When the symbols are unchanged and the history extends the last one loaded,
+        only the new periods are added. Otherwise the last window is replayed, so a
+        changed universe does not restart it empty.
+        Args: closes - One row per period (e.g. trading day), one column per ticker, oldest first
+        """
+        if closes is None or closes.empty:
+            return
+        version = (closes.index[-1], tuple(closes.columns))
+        with self._lock:
+            previous = self.last_version
+            if version == previous:
+                return
+            self.last_version = version
+
+            if previous is not None and previous[1] == version[1] and previous[0] in closes.index:
+                new_rows = closes.loc[closes.index > previous[0]]
+                if 0 < len(new_rows) <= self.window:
+                    self._replay(np.vstack([self._last_prices, new_rows.to_numpy(dtype=np.float64)]))
+                    return
+
+            self.set_universe(list(closes.columns))
+            self._replay(closes.tail(self.window + 1).to_numpy(dtype=np.float64))
+
+    def _replay(self, prices: np.ndarray) -> None:
+        # Add the returns between consecutive rows; missing closes count as unchanged, like in add_prices
+        prices = pd.DataFrame(prices).ffill().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.nan_to_num(prices[1:] / prices[:-1] - 1.0, nan=0.0, posinf=0.0, neginf=0.0)
+        for row in returns:
+            self._add_returns(row)
+        self._last_prices = prices[-1]
+
+    def correlation(self, symbols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Get the correlation matrix for all symbols or a subset"""
+        with self._lock:
+            if symbols is None:
+                columns = list(range(len(self.symbols)))
+            else:
+                columns = [self.index[s] for s in map(base_symbol, symbols) if s in self.index]
+            labels = [self.symbols[i] for i in columns]
+            if self.count < 2 or not columns:
+                return pd.DataFrame(np.eye(len(columns)), index=labels, columns=labels)
+            sums = self._sums[columns]
+            cross = self._cross[np.ix_(columns, columns)]
+            count = self.count
+
+        mean = sums / count
+        covariance = cross / count - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(covariance), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = covariance / np.outer(std, std)
+        corr = np.nan_to_num(np.clip(corr, -1.0, 1.0))
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=labels, columns=labels)
+
+    def most_correlated_pairs(self, k: int = 5, symbols: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get the most positively correlated pairs
+        Args: k - Number of pairs
+              symbols - Optional basket to restrict the search to
+        Returns: List of dicts with both symbols and their correlation, highest first
+        """
+        if symbols is not None:
+            symbols = [s for s in map(base_symbol, symbols) if s in self.index]
+        corr = self.correlation(symbols)
+        if len(corr) < 2 or self.count < 2:
+            return []
+        rows, cols = np.triu_indices(len(corr), k=1)
+        values = corr.to_numpy()[rows, cols]
+        k = min(k, len(values))
+        top = np.argpartition(-values, k - 1)[:k]
+        top = top[np.argsort(-values[top])]
+        labels = corr.index
+        return [{'a': labels[rows[i]], 'b': labels[cols[i]], 'correlation': float(values[i])} for i in top]
+
+    def average_correlation(self, symbols: Sequence[str]) -> Optional[float]:
+        """Get the average pairwise correlation within a basket, or None without enough history"""
+        symbols = [s for s in map(base_symbol, symbols) if s in self.index]
+        if len(symbols) < 2 or self.count < 2:
+            return None
+        corr = self.correlation(symbols).to_numpy()
+        rows, cols = np.triu_indices(len(corr), k=1)
+        return float(corr[rows, cols].mean())
+
+
+def describe_basket(tickers: Sequence[str], tracker: Optional[RollingCorrelation] = None, pairs: int = 3) -> str:
+    """
+    Summarize the sector concentration and correlation of a candidate basket for the AI prompt
+    Args: tickers - Candidate tickers
+          tracker - Correlation tracker, defaults to the process-wide one
+          pairs - Number of most-correlated pairs to list
+    Returns: Short multi-line description
+    """
+    tracker = tracker or correlation_tracker
+    concentration = sector_concentration(tickers)
+    if not concentration['sectors']:
+        return ""
+    sectors = ", ".join(f"{sector} {weight:.0%}" for sector, weight in concentration['sectors'].items())
+    lines = [f"Sector mix: {sectors} (HHI {concentration['hhi']:.2f})"]
+
+    average = tracker.average_correlation(tickers)
+    if average is not None:
+        top_pairs = tracker.most_correlated_pairs(pairs, tickers)
+        pair_text = ", ".join(f"{p['a']}/{p['b']} {p['correlation']:.2f}" for p in top_pairs)
+        lines.append(f"Daily return correlation over last {tracker.count} trading days: avg {average:.2f}; highest {pair_text}")
+    return "\n".join(lines)
+
+
+# Shared by every session in this process
+correlation_tracker = RollingCorrelation()
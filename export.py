@@ -0,0 +1,212 @@
+"""
+Columnar export of analysis snapshots and smart beta rankings
+
+Snapshots are encoded once per (dataset, version, format) and the encoded
+buffers are cached, so repeated downloads reuse the same bytes. Besides the
+Streamlit download buttons, a small WSGI app streams snapshot exports over
+HTTP:
+
+    gunicorn export:application --bind 0.0.0.0:8081
+
+    GET /export/kmi30/<snapshot version>.<csv|arrow|parquet>
+
+Rankings are only exported from the app: they depend on the price-refreshed
+smart beta engine of the app process, which the export process does not have.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# MIME type per export format
+FORMATS = {
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.file',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Memory cap for cached encoded exports (override with EXPORT_CACHE_MAX_MB)
+DEFAULT_MAX_BYTES = int(float(os.getenv("EXPORT_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+# Size of each streamed response chunk
+CHUNK_SIZE = 64 * 1024
+
+
+def _columnar_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Make mixed 'N/A'/number columns typed so Arrow and Parquet get numeric columns"""
+    frame = df.copy()
+    for column in frame.columns:
+        if frame[column].dtype == object:
+            values = frame[column].replace('N/A', None)
+            try:
+                frame[column] = pd.to_numeric(values)
+            except (ValueError, TypeError):
+                frame[column] = frame[column].astype(str)
+    return frame
+
+
+def encode(df: pd.DataFrame, fmt: str) -> Any:
+    """
+    Encode a DataFrame
+    Args: df - Data to export
+          fmt - One of FORMATS
+    Returns: Encoded bytes
+    """
+    if fmt == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    table = pa.Table.from_pandas(_columnar_frame(df), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if fmt == 'arrow':
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == 'parquet':
+        pq.write_table(table, sink, compression='zstd')
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    # Converted once per cached export; WSGI servers and download buttons need bytes
+    return sink.getvalue().to_pybytes()
+
+
+class ExportCache:
+    """
+    LRU cache of encoded exports keyed by dataset, version and format
+
+    Concurrent requests for the same missing export wait for a single encode.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.encodes = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._pending: Dict[tuple, threading.Lock] = {}
+
+    def get(self, dataset: str, version: str, fmt: str, loader: Callable[[], Optional[pd.DataFrame]]) -> Optional[bytes]:
+        """
+        Get an encoded export, encoding it on first use
+        Args: dataset - Dataset name (e.g. 'kmi30', 'rankings')
+              version - Version ID of the data
+              fmt - One of FORMATS
+              loader - Returns the DataFrame to encode, or None if the version is unknown
+        Returns: Encoded bytes, or None if the data is not available
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        key = (dataset, version, fmt)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            pending = self._pending.setdefault(key, threading.Lock())
+
+        try:
+            with pending:
+                with self._lock:
+                    if key in self._entries:
+                        return self._entries[key]
+                df = loader()
+                if df is None:
+                    return None
+                buffer = encode(df, fmt)
+                with self._lock:
+                    self.encodes += 1
+                    self._entries[key] = buffer
+                    self.total_bytes += len(buffer)
+                    while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                        _, evicted = self._entries.popitem(last=False)
+                        self.total_bytes -= len(evicted)
+                return buffer
+        finally:
+            with self._lock:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+
+
+# Shared by every session in this process
+export_cache = ExportCache()
+
+
+def load_snapshot(version: str) -> Optional[pd.DataFrame]:
+    """Load a KMI-30 snapshot from this process or, failing that, from the shared cache"""
+    from snapshot_store import store
+    from shared_cache import shared_cache
+
+    value = store.get(version)
+    if value is None:
+        value = shared_cache.get_object(f"snapshot:{version}")
+    return value if isinstance(value, pd.DataFrame) else None
+
+
+def rankings_frame(engine: Any, risk_profile: str) -> Optional[pd.DataFrame]:
+    """Get the full smart beta ranking for a risk profile, or None if it rests on placeholder fundamentals"""
+    if engine.fundamentals.is_placeholder:
+        return None
+    recommendations = engine.get_stock_recommendations(risk_profile, num_recommendations=len(engine.fundamentals))
+    return pd.DataFrame([{
+        'rank': i + 1,
+        **r['stock'],
+        'strategy': r['strategy'],
+        'score': r['score'],
+    } for i, r in enumerate(recommendations)])
+
+
+def rankings_version(engine: Any, risk_profile: str) -> str:
+    """Get a version ID that changes whenever the engine's ranking for a profile may change"""
+    return f"{risk_profile}-{id(engine.scores)}-{engine.scores.revision}"
+
+
+def get_kmi30_export(version: str, fmt: str) -> Optional[bytes]:
+    """Get an encoded KMI-30 snapshot export"""
+    return export_cache.get('kmi30', version, fmt, lambda: load_snapshot(version))
+
+
+def get_rankings_export(engine: Any, risk_profile: str, fmt: str) -> Optional[bytes]:
+    """Get an encoded smart beta ranking export, or None without real fundamentals"""
+    # Price updates wait until the export is encoded, so it always matches its revision
+    with engine.lock:
+        return export_cache.get(
+            'rankings', rankings_version(engine, risk_profile), fmt, lambda: rankings_frame(engine, risk_profile)
+        )
+
+
+def stream(buffer: bytes, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield an encoded export in chunks; PEP 3333 requires bytes, not memoryviews"""
+    for start in range(0, len(buffer), chunk_size):
+        yield buffer[start:start + chunk_size]
+
+
+_ROUTE = re.compile(r"^/export/kmi30/([\w.-]+)\.(csv|arrow|parquet)$")
+
+
+def application(environ: Dict[str, Any], start_response: Callable) -> Any:
+    """WSGI endpoint streaming cached snapshot exports"""
+    match = _ROUTE.match(environ.get('PATH_INFO', ''))
+    if environ.get('REQUEST_METHOD', 'GET') != 'GET' or not match:
+        start_response('404 Not Found', [('Content-Type', 'text/plain')])
+        return [b"Not found"]
+
+    # Snapshot versions are content hashes, so the ETag is the same on every worker
+    name, fmt = match.groups()
+    buffer = get_kmi30_export(name, fmt)
+    etag = f'"{name}-{fmt}"'
+
+    if buffer is None:
+        start_response('404 Not Found', [('Content-Type', 'text/plain')])
+        return [b"Snapshot not found or expired"]
+    if environ.get('HTTP_IF_NONE_MATCH') == etag:
+        start_response('304 Not Modified', [('ETag', etag)])
+        return []
+
+    start_response('200 OK', [
+        ('Content-Type', FORMATS[fmt]),
+        ('Content-Length', str(len(buffer))),
+        ('Content-Disposition', f'attachment; filename="kmi30-{name}.{fmt}"'),
+        ('ETag', etag),
+        ('Cache-Control', 'public, max-age=3600'),
+    ])
+    return stream(buffer)
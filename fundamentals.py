@@ -0,0 +1,198 @@
+import os
+import time
+import threading
+from typing import Dict, Any, List, Optional
+import numpy as np
+import pandas as pd
+
+# Fundamental fields used by the smart beta factors
+FIELDS = ['roe', 'pe_ratio', 'pb_ratio', 'revenue_growth', 'momentum', 'volatility']
+
+# Directory of memory-mapped .npy columns, or a .parquet file (override with FUNDAMENTALS_PATH)
+DEFAULT_PATH = os.getenv(
+    "FUNDAMENTALS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fundamentals')
+)
+
+# Minimum seconds between checks for a changed file
+RELOAD_CHECK_INTERVAL = 5.0
+
+# Source of the placeholder table used when no fundamentals file is available
+FALLBACK_SOURCE = 'fallback'
+
+# KMI constituents used when no fundamentals file is available
+FALLBACK_SYMBOLS = ['ATRL', 'DGKC', 'EFERT', 'EPCL', 'FABL', 'HBL', 'MCB', 'UBL', 'LUCK', 'ENGRO']
+
+
+class FundamentalsTable:
+    """
+    Read-only columnar table of fundamentals for the KMI universe
+
+    Columns are NumPy arrays (memory-mapped when loaded from .npy files) shared
+    by every SmartBetaEngine in the process, so no per-instance copies are made.
+    """
+
+    def __init__(self, symbols: np.ndarray, names: np.ndarray, columns: Dict[str, np.ndarray], source: str):
+        self.symbols = symbols
+        self.names = names
+        self.columns = columns
+        self.source = source
+        self.index = {symbol: i for i, symbol in enumerate(symbols.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def is_placeholder(self) -> bool:
+        """Whether the values are generated placeholders rather than real fundamentals"""
+        return self.source == FALLBACK_SOURCE
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """Get one stock as a dict in the SmartBetaEngine stock format"""
+        stock = {'symbol': str(self.symbols[i]), 'name': str(self.names[i])}
+        for field in FIELDS:
+            stock[field] = float(self.columns[field][i])
+        return stock
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get the table as a DataFrame"""
+        return pd.DataFrame({'symbol': self.symbols, 'name': self.names, **self.columns})
+
+
+_lock = threading.Lock()
+_cache: Dict[str, Dict[str, Any]] = {}
+
+
+def _column_files(path: str) -> Dict[str, str]:
+    files = {'symbols': os.path.join(path, 'symbols.npy'), 'names': os.path.join(path, 'names.npy')}
+    for field in FIELDS:
+        files[field] = os.path.join(path, f'{field}.npy')
+    return files
+
+
+def _mtimes(path: str) -> Dict[str, float]:
+    if os.path.isdir(path):
+        return {name: os.stat(file).st_mtime_ns for name, file in _column_files(path).items()}
+    return {'file': os.stat(path).st_mtime_ns}
+
+
+def _load_column(file: str) -> np.ndarray:
+    # Numeric columns are memory-mapped read-only; strings are small and loaded eagerly
+    column = np.load(file, mmap_mode='r', allow_pickle=False)
+    if column.dtype.kind == 'U':
+        column = np.array(column)
+        column.flags.writeable = False
+    return column
+
+
+def _load(path: str, previous: Optional[FundamentalsTable], changed: List[str]) -> FundamentalsTable:
+    if not os.path.isdir(path):
+        frame = pd.read_parquet(path, columns=['symbol', 'name'] + FIELDS)
+        columns = {}
+        for field in FIELDS:
+            columns[field] = frame[field].to_numpy(dtype=np.float64)
+            columns[field].flags.writeable = False
+        return FundamentalsTable(frame['symbol'].to_numpy(str), frame['name'].to_numpy(str), columns, path)
+
+    files = _column_files(path)
+    if previous is None or 'symbols' in changed:
+        changed = list(files)
+    # Only reload the columns whose files changed
+    columns = dict(previous.columns) if previous is not None else {}
+    for field in FIELDS:
+        if field in changed:
+            columns[field] = _load_column(files[field])
+    symbols = _load_column(files['symbols']) if 'symbols' in changed else previous.symbols
+    names = _load_column(files['names']) if 'names' in changed else previous.names
+    for field, column in columns.items():
+        if len(column) != len(symbols):
+            raise ValueError(f"Fundamentals column {field} has {len(column)} rows, expected {len(symbols)}")
+    return FundamentalsTable(symbols, names, columns, path)
+
+
+def _fallback_table() -> FundamentalsTable:
+    # Deterministic placeholder values so results are reproducible without a data file
+    rng = np.random.default_rng(30)
+    n = len(FALLBACK_SYMBOLS)
+    columns = {
+        'roe': rng.uniform(5, 25, n),
+        'pe_ratio': rng.uniform(5, 30, n),
+        'pb_ratio': rng.uniform(0.5, 5, n),
+        'revenue_growth': rng.uniform(-10, 30, n),
+        'momentum': rng.uniform(-20, 40, n),
+        'volatility': rng.uniform(5, 30, n),
+    }
+    for column in columns.values():
+        column.flags.writeable = False
+    symbols = np.array(FALLBACK_SYMBOLS)
+    names = np.array([f"{symbol} (placeholder data)" for symbol in FALLBACK_SYMBOLS])
+    return FundamentalsTable(symbols, names, columns, FALLBACK_SOURCE)
+
+
+def load_fundamentals(path: str = DEFAULT_PATH) -> FundamentalsTable:
+    """
+    Load the fundamentals table once per process and reload it when its files change
+    Args: path - Directory of .npy columns or a .parquet file
+    Returns: Shared FundamentalsTable
+    """
+    with _lock:
+        entry = _cache.get(path)
+        now = time.monotonic()
+        if entry is not None and now - entry['checked'] < RELOAD_CHECK_INTERVAL:
+            return entry['table']
+
+        def keep_current(reason: str) -> FundamentalsTable:
+            # Keep the table we have (or placeholder data) and retry on the next check
+            nonlocal entry
+            if entry is None:
+                print(f"{reason}. Using placeholder data for fallback tickers.")
+                entry = _cache[path] = {'table': _fallback_table(), 'mtimes': {}}
+            elif entry['mtimes']:
+                print(f"{reason}. Keeping previous fundamentals.")
+            entry['checked'] = now
+            return entry['table']
+
+        if not os.path.exists(path):
+            return keep_current(f"Fundamentals file not found at {path}")
+
+        try:
+            mtimes = _mtimes(path)
+        except FileNotFoundError as e:
+            # Usually the first write_fundamentals is still creating the column files
+            return keep_current(f"Fundamentals at {path} are incomplete: {e.filename} is missing")
+
+        if entry is None or mtimes != entry['mtimes']:
+            previous = entry['table'] if entry is not None and entry['mtimes'] else None
+            changed = [name for name, mtime in mtimes.items() if entry is None or entry['mtimes'].get(name) != mtime]
+            try:
+                table = _load(path, previous, changed)
+            except (ValueError, OSError) as e:
+                # Usually a writer is midway through replacing the files
+                return keep_current(f"Could not load fundamentals: {e}")
+            entry = _cache[path] = {'table': table, 'mtimes': mtimes}
+            print(f"Loaded fundamentals for {len(table)} symbols from {path}")
+        entry['checked'] = now
+        return entry['table']
+
+
+def write_fundamentals(frame: pd.DataFrame, path: str = DEFAULT_PATH) -> None:
+    """
+    Write fundamentals as memory-mappable .npy columns
+    Args: frame - DataFrame with symbol, name and the FIELDS columns
+          path - Output directory
+    """
+    os.makedirs(path, exist_ok=True)
+    arrays = {
+        'symbols': frame['symbol'].to_numpy(str),
+        'names': frame['name'].to_numpy(str) if 'name' in frame else frame['symbol'].to_numpy(str),
+    }
+    for field in FIELDS:
+        arrays[field] = frame[field].to_numpy(dtype=np.float64)
+    for name, file in _column_files(path).items():
+        # Write then rename so running processes keep their existing mappings intact
+        tmp = f"{file}.tmp.npy"
+        np.save(tmp, arrays[name], allow_pickle=False)
+        os.replace(tmp, file)
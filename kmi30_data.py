@@ -2,24 +2,62 @@ import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import re
+import os
+import asyncio
+from typing import Any, Dict, List
 from tradingview_ta import TA_Handler, Interval
+from profiling import profiled
+import async_runner
 
-def get_kmi30_tickers():
+# PSX index page listing the KMI-30 constituents (overridable for local stand-ins)
+KMI30_URL = os.getenv("PSX_KMI30_URL", 'https://dps.psx.com.pk/indices/KMI30')
+
+# PSX end-of-day price history per symbol (overridable for local stand-ins)
+PSX_EOD_URL = os.getenv("PSX_EOD_URL", 'https://dps.psx.com.pk/timeseries/eod/{symbol}')
+
+# Fallback list if scraping fails
+FALLBACK_TICKERS = ['ATRL', 'DGKC', 'EFERT', 'EPCL', 'FABL', 'HBL', 'MCB', 'UBL', 'LUCK', 'ENGRO']
+
+# Per-stage limits for the async pipeline (seconds / concurrent requests)
+SCRAPE_TIMEOUT = float(os.getenv("PSX_SCRAPE_TIMEOUT", "15"))
+TA_TIMEOUT = float(os.getenv("TA_TIMEOUT", "10"))
+TA_CONCURRENCY = int(os.getenv("TA_CONCURRENCY", "8"))
+EOD_TIMEOUT = float(os.getenv("PSX_EOD_TIMEOUT", "10"))
+
+# Trading days of closing prices kept per symbol
+HISTORY_DAYS = int(os.getenv("PRICE_HISTORY_DAYS", "250"))
+
+@profiled
+def get_kmi30_tickers(timeout=None):
     """
     Scrape KMI-30 tickers from PSX website
+    Args: timeout - Optional request timeout in seconds
     Returns: List of ticker symbols
     """
-    url = 'https://dps.psx.com.pk/indices/KMI30'
+    url = KMI30_URL
     try:
         # Fetch the webpage
-        response = requests.get(url)
+        response = requests.get(url, timeout=timeout)
         if response.status_code != 200:
             print(f"Failed to fetch webpage. Status code: {response.status_code}")
             return []
 
+        return parse_kmi30_tickers(response.text)
+
+    except Exception as e:
+        print(f"An error occurred while fetching tickers: {e}")
+        return []
+
+def parse_kmi30_tickers(html):
+    """
+    Extract KMI-30 tickers from the PSX index page
+    Args: html - Page content
+    Returns: List of ticker symbols
+    """
+    try:
         # Parse HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        print("Webpage fetched and parsed successfully.")
+        soup = BeautifulSoup(html, 'html.parser')
+        print("Webpage parsed successfully.")
 
         # Find all tables on the page
         tables = soup.find_all('table')
@@ -78,78 +116,198 @@ def get_kmi30_tickers():
         return []
 
     except Exception as e:
-        print(f"An error occurred while fetching tickers: {e}")
+        print(f"An error occurred while parsing tickers: {e}")
         return []
 
+def empty_analysis(symbol: str) -> Dict[str, Any]:
+    """Analysis row for a ticker whose data could not be fetched"""
+    return {
+        'Ticker': f"{symbol}.KAR",
+        'Current Price': 'N/A',
+        'Summary': 'N/A',
+        'RSI': 'N/A',
+        'MACD': 'N/A',
+        'MACD Signal': 'N/A',
+        'ADX': 'N/A',
+        'Volume': 'N/A',
+    }
+
+@profiled
+def get_ticker_analysis(symbol: str, timeout=None) -> Dict[str, Any]:
+    """
+    Get technical analysis for a single ticker
+    Args: symbol - Ticker symbol
+          timeout - Optional request timeout in seconds
+    Returns: Analysis row, with 'N/A' values if the request failed
+    """
+    try:
+        handler = TA_Handler(
+            symbol=symbol,
+            screener="pakistan",
+            exchange="PSX",
+            interval=Interval.INTERVAL_1_DAY,
+            timeout=timeout
+        )
+        analysis = handler.get_analysis()
+
+        result = {
+            'Ticker': f"{symbol}.KAR",
+            'Current Price': analysis.indicators.get('close', 'N/A'),
+            'Summary': analysis.summary.get('RECOMMENDATION', 'N/A'),
+            'RSI': round(analysis.indicators.get('RSI', 0), 2) if analysis.indicators.get('RSI') else 'N/A',
+            'MACD': round(analysis.indicators.get('MACD.macd', 0), 2) if analysis.indicators.get('MACD.macd') else 'N/A',
+            'MACD Signal': round(analysis.indicators.get('MACD.signal', 0), 2) if analysis.indicators.get('MACD.signal') else 'N/A',
+            'ADX': round(analysis.indicators.get('ADX', 0), 2) if analysis.indicators.get('ADX') else 'N/A',
+            'Volume': round(analysis.indicators.get('volume', 0), 2) if analysis.indicators.get('volume') else 'N/A',
+        }
+        print(f"✓ {symbol} - Price: {result['Current Price']}, Recommendation: {result['Summary']}")
+        return result
+
+    except Exception as e:
+        print(f"✗ Error fetching {symbol}: {e}")
+        return empty_analysis(symbol)
+
 def get_technical_analysis(tickers):
     """
     Get comprehensive technical analysis for a list of tickers
     Args: tickers - List of ticker symbols
     Returns: DataFrame with technical analysis data
     """
-    results = []
-    
     print(f"\nFetching technical analysis for {len(tickers)} tickers...")
-    
-    for symbol in tickers:
+    return pd.DataFrame([get_ticker_analysis(symbol) for symbol in tickers])
+
+@profiled
+def get_daily_closes(symbol: str, timeout=None) -> pd.Series:
+    """
+    Get daily closing prices for a ticker from the PSX data portal
+    Args: symbol - Ticker symbol
+          timeout - Optional request timeout in seconds
+    Returns: Closing prices indexed by date, oldest first; empty if unavailable
+    """
+    try:
+        response = requests.get(PSX_EOD_URL.format(symbol=symbol), timeout=timeout)
+        if response.status_code != 200:
+            print(f"✗ No price history for {symbol}. Status code: {response.status_code}")
+            return pd.Series(dtype=float, name=symbol)
+        return parse_daily_closes(symbol, response.json())
+
+    except Exception as e:
+        print(f"✗ Error fetching price history for {symbol}: {e}")
+        return pd.Series(dtype=float, name=symbol)
+
+def parse_daily_closes(symbol: str, payload: Any) -> pd.Series:
+    """
+    Extract closing prices from a PSX end-of-day response
+    Args: symbol - Ticker symbol
+          payload - Decoded JSON with rows of [unix time, close, volume, open]
+    Returns: Last HISTORY_DAYS closing prices indexed by date, oldest first
+    """
+    rows = payload.get('data') if isinstance(payload, dict) else payload
+    closes = {}
+    for row in rows or []:
         try:
-            handler = TA_Handler(
-                symbol=symbol,
-                screener="pakistan",
-                exchange="PSX",
-                interval=Interval.INTERVAL_1_DAY
-            )
-            analysis = handler.get_analysis()
-
-            result = {
-                'Ticker': f"{symbol}.KAR",
-                'Current Price': analysis.indicators.get('close', 'N/A'),
-                'Summary': analysis.summary.get('RECOMMENDATION', 'N/A'),
-                'RSI': round(analysis.indicators.get('RSI', 0), 2) if analysis.indicators.get('RSI') else 'N/A',
-                'MACD': round(analysis.indicators.get('MACD.macd', 0), 2) if analysis.indicators.get('MACD.macd') else 'N/A',
-                'MACD Signal': round(analysis.indicators.get('MACD.signal', 0), 2) if analysis.indicators.get('MACD.signal') else 'N/A',
-                'ADX': round(analysis.indicators.get('ADX', 0), 2) if analysis.indicators.get('ADX') else 'N/A',
-                'Volume': round(analysis.indicators.get('volume', 0), 2) if analysis.indicators.get('volume') else 'N/A',
-            }
-            results.append(result)
-            print(f"✓ {symbol} - Price: {result['Current Price']}, Recommendation: {result['Summary']}")
-            
-        except Exception as e:
-            print(f"✗ Error fetching {symbol}: {e}")
-            results.append({
-                'Ticker': f"{symbol}.KAR",
-                'Current Price': 'N/A',
-                'Summary': 'N/A',
-                'RSI': 'N/A',
-                'MACD': 'N/A',
-                'MACD Signal': 'N/A',
-                'ADX': 'N/A',
-                'Volume': 'N/A',
-            })
-    
+            date = pd.Timestamp(int(row[0]), unit='s').normalize()
+            close = float(row[1])
+        except (TypeError, ValueError, IndexError):
+            continue
+        if close > 0:
+            closes[date] = close
+    return pd.Series(closes, dtype=float, name=symbol).sort_index().tail(HISTORY_DAYS)
+
+async def get_kmi30_tickers_async(timeout: float = SCRAPE_TIMEOUT) -> List[str]:
+    """
+    Scrape KMI-30 tickers without blocking the event loop
+    Args: timeout - Seconds allowed for fetching and parsing the page
+    Returns: List of ticker symbols, empty on failure or timeout
+    """
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(get_kmi30_tickers, timeout), timeout)
+    except asyncio.TimeoutError:
+        print(f"Fetching KMI-30 tickers timed out after {timeout}s")
+        return []
+
+async def get_technical_analysis_async(
+    tickers: List[str],
+    concurrency: int = TA_CONCURRENCY,
+    timeout: float = TA_TIMEOUT
+) -> pd.DataFrame:
+    """
+    Get technical analysis for a list of tickers concurrently
+    Args: tickers - List of ticker symbols
+          concurrency - Maximum number of requests in flight
+          timeout - Seconds allowed per ticker; slow tickers get 'N/A' rows
+    Returns: DataFrame with technical analysis data, in ticker order
+    """
+    print(f"\nFetching technical analysis for {len(tickers)} tickers ({concurrency} at a time)...")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(symbol: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                # The request timeout also frees the worker thread once we stop waiting
+                return await asyncio.wait_for(asyncio.to_thread(get_ticker_analysis, symbol, timeout), timeout)
+            except asyncio.TimeoutError:
+                print(f"✗ Timed out fetching {symbol} after {timeout}s")
+                return empty_analysis(symbol)
+
+    # gather cancels the outstanding fetches if the caller is cancelled
+    results = await asyncio.gather(*(fetch(symbol) for symbol in tickers))
     return pd.DataFrame(results)
 
-def get_kmi30_analysis():
+async def get_price_history_async(
+    tickers: List[str],
+    concurrency: int = TA_CONCURRENCY,
+    timeout: float = EOD_TIMEOUT
+) -> pd.DataFrame:
     """
-    Main function to execute the complete workflow
+    Get daily closing prices for a list of tickers concurrently
+    Args: tickers - List of ticker symbols
+          concurrency - Maximum number of requests in flight
+          timeout - Seconds allowed per ticker; slow tickers are left out
+    Returns: DataFrame of closes with one row per trading day and one column per ticker
+    """
+    print(f"\nFetching daily closes for {len(tickers)} tickers ({concurrency} at a time)...")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(symbol: str) -> pd.Series:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(asyncio.to_thread(get_daily_closes, symbol, timeout), timeout)
+            except asyncio.TimeoutError:
+                print(f"✗ Timed out fetching price history for {symbol} after {timeout}s")
+                return pd.Series(dtype=float, name=symbol)
+
+    series = [s for s in await asyncio.gather(*(fetch(symbol) for symbol in tickers)) if not s.empty]
+    if not series:
+        return pd.DataFrame()
+    return pd.concat(series, axis=1).sort_index()
+
+async def get_kmi30_analysis_async() -> pd.DataFrame:
+    """
+    Async version of the complete workflow
     Returns: DataFrame with analysis results
     """
     print("=== KMI-30 Automated Analysis Tool ===\n")
     
     # Step 1: Get KMI-30 tickers from PSX website
     print("Step 1: Fetching KMI-30 tickers from PSX website...")
-    tickers = get_kmi30_tickers()
+    tickers = await get_kmi30_tickers_async()
     
     if not tickers:
         print("No tickers found. Using fallback list...")
-        # Fallback to a known list if scraping fails
-        tickers = ['ATRL', 'DGKC', 'EFERT', 'EPCL', 'FABL', 'HBL', 'MCB', 'UBL', 'LUCK', 'ENGRO']
+        tickers = FALLBACK_TICKERS
         print(f"Using fallback tickers: {tickers}")
     
     print(f"Total tickers found: {len(tickers)}")
     
     # Step 2: Get technical analysis for all tickers
     print("\nStep 2: Fetching technical analysis data...")
-    df = get_technical_analysis(tickers)
-    
-    return df 
\ No newline at end of file
+    return await get_technical_analysis_async(tickers)
+
+@profiled
+def get_kmi30_analysis():
+    """
+    Main function to execute the complete workflow
+    Returns: DataFrame with analysis results
+    """
+    return async_runner.run(get_kmi30_analysis_async())
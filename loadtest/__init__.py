@@ -0,0 +1 @@
+"""Load-testing harness and local upstream stand-ins for the Streamlit app"""
@@ -0,0 +1,221 @@
+"""
+Concurrent-session load test for the Streamlit app
+
+Drives simulated sessions through the five risk questions and "Complete
+Assessment" with Streamlit's AppTest, against local stand-ins for PSX,
+TradingView and Gemini. Reports throughput, page latency percentiles,
+memory per session and upstream call counts for each concurrency level.
+
+AppTest shares one Streamlit runtime per process and is not safe to run
+from several threads, so each concurrent session runs in its own worker
+process. Workers share upstream results through a SQLite shared cache, the
+way replicas share them through Redis in production.
+
+Run with:
+    python -m loadtest.harness --sessions 10,50,100 --psx-latency 0.2 --tradingview-latency 0.1 --gemini-latency 2
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app.py')
+
+# Number of risk questions in app.risk_questions
+QUESTIONS = 5
+
+# Sessions run by this worker process, kept alive so their memory stays allocated
+_sessions: List[Any] = []
+
+# Shared by the workers of a level so that each runs exactly one warm-up session
+_barrier: Any = None
+
+
+def _rss_bytes() -> int:
+    """Get the resident set size of this process (Linux), or 0 if unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _click(at: Any, label: str) -> None:
+    next(b for b in at.button if b.label == label).click()
+
+
+def run_session(seed: int, timeout: float) -> Dict[str, Any]:
+    """
+    Drive one session from the first question to the results page
+    Returns: Dict with per-page latencies, the assessment latency, the AppTest and any error
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    pages: List[float] = []
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def timed(step):
+        start = time.perf_counter()
+        step()
+        at.run()
+        pages.append(time.perf_counter() - start)
+
+    try:
+        timed(lambda: None)
+        # Follow whichever question is shown: AppTest may skip ahead when a click triggers st.rerun
+        for _ in range(QUESTIONS * 2):
+            for radio in at.radio:
+                radio.set_value(rng.choice(radio.options))
+            labels = [b.label for b in at.button]
+            is_last = "Complete Assessment ✅" in labels
+            timed(lambda: _click(at, "Complete Assessment ✅" if is_last else "Next ➡️"))
+            if is_last:
+                break
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        if at.session_state.risk_profile is None:
+            raise RuntimeError("Assessment did not complete")
+        return {'pages': pages, 'assessment': pages[-1], 'app': at, 'error': None}
+    except Exception as e:
+        return {'pages': pages, 'assessment': None, 'app': at, 'error': repr(e)}
+
+
+def _init_worker(server_url: str, shared_cache_url: str, barrier: Any) -> None:
+    global _barrier
+    # Configure the app before any of its modules are imported
+    os.environ['SHARED_CACHE_URL'] = shared_cache_url
+    os.environ.setdefault('GEMINI_API_KEY', 'load-test')
+    sys.path.insert(0, ROOT)
+    _barrier = barrier
+
+    from loadtest.stand_ins import install
+    install(server_url)
+
+
+def _warm_up(seed: int, timeout: float) -> int:
+    """
+    Run one throwaway session so imports and first-run caches are not measured
+    It uses a private cache, so the measured sessions still start with a cold shared cache.
+    """
+    from shared_cache import shared_cache, InMemoryBackend
+
+    backend, shared_cache.backend = shared_cache.backend, InMemoryBackend()
+    try:
+        result = run_session(-1 - seed, timeout)
+    finally:
+        shared_cache.backend = backend
+    if result['error']:
+        print(f"Warm-up session failed: {result['error']}")
+    # Hold every worker here until all have warmed up, so each one runs exactly one warm-up
+    _barrier.wait(timeout)
+    return os.getpid()
+
+
+def _worker_session(seed: int, timeout: float) -> Dict[str, Any]:
+    """Run one session in a warmed-up worker process and report its memory footprint"""
+    from snapshot_store import store
+
+    rss_before = _rss_bytes()
+    snapshot_before = store.report()['total_bytes']
+    result = run_session(seed, timeout)
+    _sessions.append(result.pop('app'))
+    result['rss_growth'] = max(0, _rss_bytes() - rss_before)
+    result['snapshot_growth'] = max(0, store.report()['total_bytes'] - snapshot_before)
+    return result
+
+
+def run_level(sessions: int, concurrency: int, timeout: float, server: Any, shared_cache_url: str) -> Dict[str, Any]:
+    """Run a batch of sessions at a concurrency level and summarize it"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(
+        max_workers=concurrency,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(server.url, shared_cache_url, context.Barrier(concurrency))
+    ) as pool:
+        list(pool.map(_warm_up, range(concurrency), [timeout] * concurrency))
+        calls_before = dict(server.calls)
+        start = time.perf_counter()
+        futures = [pool.submit(_worker_session, seed, timeout) for seed in range(sessions)]
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+
+    pages = np.array([p for r in results for p in r['pages']])
+    assessments = np.array([r['assessment'] for r in results if r['assessment'] is not None])
+    errors = [r['error'] for r in results if r['error']]
+
+    def percentiles(values: np.ndarray) -> Dict[str, float]:
+        if len(values) == 0:
+            return {'p50': float('nan'), 'p95': float('nan'), 'p99': float('nan')}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'p50': p50, 'p95': p95, 'p99': p99}
+
+    return {
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'elapsed': elapsed,
+        'throughput': (sessions - len(errors)) / elapsed,
+        'page_latency': percentiles(pages),
+        'assessment_latency': percentiles(assessments),
+        'memory_per_session': sum(r['rss_growth'] for r in results) / max(1, sessions),
+        'snapshot_per_session': sum(r['snapshot_growth'] for r in results) / max(1, sessions),
+        'upstream_calls': {k: server.calls[k] - calls_before.get(k, 0) for k in ('psx', 'tradingview', 'gemini')},
+        'errors': errors,
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    page, assessment, calls = result['page_latency'], result['assessment_latency'], result['upstream_calls']
+    print(f"\n=== {result['sessions']} sessions, concurrency {result['concurrency']} ===")
+    print(f"Throughput: {result['throughput']:.2f} completed sessions/s ({result['elapsed']:.1f}s total)")
+    print(f"Page latency (s): p50 {page['p50']:.3f}  p95 {page['p95']:.3f}  p99 {page['p99']:.3f}")
+    print(f"Assessment latency (s): p50 {assessment['p50']:.3f}  p95 {assessment['p95']:.3f}  p99 {assessment['p99']:.3f}")
+    print(f"Memory per session: {result['memory_per_session'] / 1024:.1f} KB RSS, {result['snapshot_per_session'] / 1024:.1f} KB snapshot store")
+    print(f"Upstream calls: PSX {calls['psx']}, TradingView {calls['tradingview']}, Gemini {calls['gemini']}")
+    if result['errors']:
+        print(f"Errors: {len(result['errors'])} (first: {result['errors'][0]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Sharia Stock Pro app with local upstream stand-ins")
+    parser.add_argument('--sessions', default='10,50', help="Comma-separated numbers of sessions per level")
+    parser.add_argument('--concurrency', type=int, default=0, help="Concurrent sessions (default: same as sessions)")
+    parser.add_argument('--psx-latency', type=float, default=0.2, help="PSX stand-in latency in seconds")
+    parser.add_argument('--tradingview-latency', type=float, default=0.1, help="TradingView stand-in latency in seconds")
+    parser.add_argument('--gemini-latency', type=float, default=2.0, help="Gemini stand-in latency in seconds")
+    parser.add_argument('--shared-cache', default='', help="SHARED_CACHE_URL for the workers (default: a temporary SQLite file)")
+    parser.add_argument('--timeout', type=float, default=300, help="Per-page timeout in seconds")
+    args = parser.parse_args()
+    shared_cache_url = args.shared_cache or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'cache.sqlite3')}"
+    sys.path.insert(0, ROOT)
+
+    from loadtest.stand_ins import StandInServer
+
+    server = StandInServer(latency={
+        'psx': args.psx_latency,
+        'tradingview': args.tradingview_latency,
+        'gemini': args.gemini_latency,
+    }).start()
+    print(f"Stand-in upstreams at {server.url}, shared cache at {shared_cache_url}")
+
+    try:
+        for sessions in [int(n) for n in args.sessions.split(',')]:
+            print_report(run_level(sessions, args.concurrency or sessions, args.timeout, server, shared_cache_url))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    # Run from the importable module: AppTest replaces __main__ in the workers,
+    # so tasks pickled as __main__._worker_session could not be found there
+    sys.path.insert(0, ROOT)
+    from loadtest.harness import main as harness_main
+    harness_main()
@@ -0,0 +1,202 @@
+"""
+Local stand-in servers for PSX, the TradingView scanner and Gemini
+
+One threaded HTTP server answers all three upstreams with configurable
+latency and counts every call, so load tests never touch the real services.
+"""
+import json
+import time
+import asyncio
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+from typing import Dict, Any, List, Optional
+import requests
+
+KMI30_TICKERS = [
+    'ATRL', 'DGKC', 'EFERT', 'EPCL', 'FABL', 'HBL', 'MCB', 'UBL', 'LUCK', 'ENGRO',
+    'MEBL', 'OGDC', 'PPL', 'POL', 'MARI', 'PSO', 'SNGP', 'HUBC', 'FFC', 'SYS',
+    'SEARL', 'MLCF', 'FCCL', 'CHCC', 'KOHC', 'INIL', 'ISL', 'ILP', 'HCAR', 'PAEL',
+]
+
+
+class StandInServer:
+    """
+    HTTP server emulating the upstream services used by the app
+
+    Routes:
+        GET  /indices/KMI30   PSX index page with a constituents table
+        GET  /timeseries/eod/<symbol>  PSX daily price history
+        POST /<screener>/scan TradingView scanner
+        POST /gemini          Gemini text generation
+    """
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None, tickers: Optional[List[str]] = None, port: int = 0):
+        self.latency = {'psx': 0.0, 'tradingview': 0.0, 'gemini': 0.0, **(latency or {})}
+        self.tickers = tickers or KMI30_TICKERS
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> 'StandInServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, upstream: str) -> None:
+        with self._lock:
+            self.calls[upstream] += 1
+
+    def _psx_page(self) -> bytes:
+        rows = "".join(f"<tr><td>{t}</td><td>Company {t}</td><td>{random.uniform(10, 500):.2f}</td></tr>" for t in self.tickers)
+        return f"<html><body><table><tr><th>Symbol</th><th>Name</th><th>Price</th></tr>{rows}</table></body></html>".encode()
+
+    @staticmethod
+    def _eod_history(days: int = 250) -> bytes:
+        # Random walk of [unix time, close, volume, open] rows, newest first like PSX
+        now = int(time.time()) // 86400 * 86400
+        close, rows = random.uniform(50, 500), []
+        for day in range(days):
+            rows.append([now - day * 86400, round(close, 2), random.randint(10**4, 10**7), round(close, 2)])
+            close *= 1 + random.gauss(0, 0.02)
+        return json.dumps({'status': 1, 'message': '', 'data': rows}).encode()
+
+    @staticmethod
+    def _indicator_value(column: str) -> float:
+        # Plausible ranges so TradingView's recommendation logic sees realistic inputs
+        name = column.split('|')[0]
+        if name.startswith('Recommend'):
+            return random.uniform(-1, 1)
+        if name.startswith(('RSI', 'Stoch', 'ADX')):
+            return random.uniform(5, 95)
+        if name.startswith('W.R'):
+            return random.uniform(-100, 0)
+        if name.startswith(('MACD', 'Mom', 'AO', 'CCI', 'BBPower')):
+            return random.uniform(-5, 5)
+        if name == 'volume':
+            return random.uniform(1e4, 1e7)
+        return random.uniform(50, 150)
+
+    def _scan(self, body: Dict[str, Any]) -> bytes:
+        columns = body.get('columns', [])
+        tickers = body.get('symbols', {}).get('tickers', [])
+        data = [{'s': t, 'd': [self._indicator_value(c) for c in columns]} for t in tickers]
+        return json.dumps({'data': data, 'totalCount': len(data)}).encode()
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith('/indices/KMI30'):
+                    stand_in._count('psx')
+                    time.sleep(stand_in.latency['psx'])
+                    self._reply(200, stand_in._psx_page(), 'text/html')
+                elif self.path.startswith('/timeseries/eod/'):
+                    stand_in._count('psx')
+                    time.sleep(stand_in.latency['psx'])
+                    self._reply(200, stand_in._eod_history(), 'application/json')
+                else:
+                    self._reply(404, b'not found', 'text/plain')
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if self.path.endswith('/scan'):
+                    stand_in._count('tradingview')
+                    time.sleep(stand_in.latency['tradingview'])
+                    self._reply(200, stand_in._scan(body), 'application/json')
+                elif self.path.startswith('/gemini'):
+                    stand_in._count('gemini')
+                    time.sleep(stand_in.latency['gemini'])
+                    text = "## Overall Market Analysis\nStand-in recommendation. " * 20
+                    self._reply(200, json.dumps({'text': text}).encode(), 'application/json')
+                else:
+                    self._reply(404, b'not found', 'text/plain')
+
+        return Handler
+
+
+class StandInModel:
+    """
+    Drop-in replacement for the Gemini GenerativeModel that calls the stand-in server
+
+    Like the real model's grpc.aio client, the async client binds to the event
+    loop it is first used on and fails on any other loop.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def generate_content(self, prompt: str, generation_config: Any = None) -> Any:
+        response = requests.post(f"{self.url}/gemini", json={'prompt': prompt}, timeout=120)
+        response.raise_for_status()
+        return SimpleNamespace(text=response.json()['text'], usage_metadata=None)
+
+    async def generate_content_async(self, prompt: str, generation_config: Any = None) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        if self._loop is not loop or self._loop.is_closed():
+            raise RuntimeError("Event loop is closed")
+
+        address = urlsplit(self.url)
+        body = json.dumps({'prompt': prompt}).encode()
+        reader, writer = await asyncio.open_connection(address.hostname, address.port)
+        try:
+            writer.write(
+                f"POST /gemini HTTP/1.1\r\nHost: {address.netloc}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        status = int(response.split(b" ", 2)[1])
+        if status != 200:
+            raise RuntimeError(f"Stand-in Gemini returned {status}")
+        payload = response.split(b"\r\n\r\n", 1)[1]
+        return SimpleNamespace(text=json.loads(payload)['text'], usage_metadata=None)
+
+    def count_tokens(self, prompt: str) -> Any:
+        # Local estimate; the stand-in does not emulate Gemini's tokenizer
+        return SimpleNamespace(total_tokens=max(1, len(prompt) // 4))
+
+
+def install(url: str) -> None:
+    """
+    Point the app's upstream clients at a stand-in server
+    Must be called before app modules fetch any data.
+    Args: url - Base URL of a running StandInServer
+    """
+    import kmi30_data
+    import ai_agent
+    from tradingview_ta import main as tradingview_main
+
+    kmi30_data.KMI30_URL = f"{url}/indices/KMI30"
+    kmi30_data.PSX_EOD_URL = f"{url}/timeseries/eod/{{symbol}}"
+    tradingview_main.TradingView.scan_url = f"{url}/"
+    ai_agent.model = StandInModel(url)
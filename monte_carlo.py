@@ -0,0 +1,132 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Sequence
+import numpy as np
+
+# Simulation defaults (override paths with SIMULATION_PATHS)
+DEFAULT_PATHS = int(os.getenv("SIMULATION_PATHS", "100000"))
+STEPS_PER_YEAR = 12
+CHUNK_PATHS = 10000
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Years of investment horizon for each time-horizon answer (question 2)
+HORIZON_YEARS = {1: 2, 2: 5, 3: 10, 4: 15}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # One pool per process, reused across simulations. Workers are spawned rather
+    # than forked: forking a multi-threaded server (e.g. Streamlit) can deadlock.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _simulate_chunk(
+    seed: np.random.SeedSequence,
+    paths: int,
+    steps: int,
+    weights: np.ndarray,
+    mu: np.ndarray,
+    sigma: np.ndarray,
+    cholesky: np.ndarray,
+    history: Optional[np.ndarray]
+) -> Dict[str, np.ndarray]:
+    """Simulate one chunk of (paths x steps x assets) returns and summarize it"""
+    rng = np.random.default_rng(seed)
+    if history is not None:
+        # Bootstrap: resample historical periods, keeping cross-asset correlation intact
+        returns = history[rng.integers(0, len(history), size=(paths, steps))]
+    else:
+        # Parametric: correlated lognormal returns per step
+        dt = 1.0 / STEPS_PER_YEAR
+        shocks = rng.standard_normal((paths, steps, len(weights))) @ cholesky.T
+        log_returns = (np.log1p(mu) - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+        returns = np.expm1(log_returns)
+
+    # Portfolio rebalanced to target weights every step
+    wealth = np.cumprod(1.0 + returns @ weights, axis=1)
+    peaks = np.maximum.accumulate(wealth, axis=1)
+    max_drawdown = (1.0 - wealth / np.maximum(peaks, 1.0)).max(axis=1)
+
+    yearly = wealth[:, STEPS_PER_YEAR - 1::STEPS_PER_YEAR]
+    return {'yearly': yearly.astype(np.float32), 'max_drawdown': max_drawdown.astype(np.float32)}
+
+
+def simulate_portfolio(
+    expected_returns: Sequence[float],
+    volatilities: Sequence[float],
+    weights: Optional[Sequence[float]] = None,
+    correlation: Optional[np.ndarray] = None,
+    history: Optional[np.ndarray] = None,
+    paths: int = DEFAULT_PATHS,
+    years: int = 10,
+    seed: int = 0,
+    parallel: bool = False
+) -> Dict[str, Any]:
+    """
+    Simulate forward portfolio wealth paths
+    Args: expected_returns - Annual expected return per asset (0.09 = 9%)
+          volatilities - Annual volatility per asset
+          weights - Portfolio weights, equal-weighted if omitted
+          correlation - Asset correlation matrix, uncorrelated if omitted
+          history - Optional (periods x assets) monthly returns to bootstrap instead of the parametric model
+          paths - Number of simulated paths
+          years - Investment horizon in years
+          seed - Seed; results are identical for the same seed regardless of worker count
+          parallel - Spread chunks across the process pool; only pays off for many assets,
+                     since shipping chunk results between processes costs more than a
+                     single-asset chunk takes to simulate
+    Returns: Dict with yearly percentile bands, terminal percentiles, probability of loss and expected max drawdown
+    """
+    mu = np.asarray(expected_returns, dtype=np.float64)
+    sigma = np.asarray(volatilities, dtype=np.float64)
+    weights = np.full(len(mu), 1.0 / len(mu)) if weights is None else np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+    correlation = np.eye(len(mu)) if correlation is None else np.asarray(correlation, dtype=np.float64)
+    cholesky = np.linalg.cholesky(correlation)
+    if history is not None:
+        history = np.asarray(history, dtype=np.float64)
+
+    steps = years * STEPS_PER_YEAR
+    sizes = [min(CHUNK_PATHS, paths - start) for start in range(0, paths, CHUNK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(s, n, steps, weights, mu, sigma, cholesky, history) for s, n in zip(seeds, sizes)]
+
+    if parallel and len(jobs) > 1 and (os.cpu_count() or 1) > 1:
+        chunks = list(_get_pool().map(_simulate_chunk, *zip(*jobs)))
+    else:
+        chunks = [_simulate_chunk(*job) for job in jobs]
+
+    yearly = np.concatenate([c['yearly'] for c in chunks])
+    max_drawdown = np.concatenate([c['max_drawdown'] for c in chunks])
+    terminal = yearly[:, -1]
+
+    bands = np.percentile(yearly, PERCENTILES, axis=0)
+    return {
+        'paths': paths,
+        'years': years,
+        'bands': {p: bands[i].tolist() for i, p in enumerate(PERCENTILES)},
+        'terminal': {p: float(bands[i][-1]) for i, p in enumerate(PERCENTILES)},
+        'median_annual_return': float(np.median(terminal) ** (1.0 / years) - 1.0),
+        'probability_of_loss': float((terminal < 1.0).mean()),
+        'expected_max_drawdown': float(max_drawdown.mean()),
+    }
+
+
+def simulate_strategy(strategy: Dict[str, Any], years: int = 10, paths: int = DEFAULT_PATHS, seed: int = 0) -> Dict[str, Any]:
+    """Simulate a smart beta strategy from its expected return and volatility"""
+    return simulate_portfolio(
+        [strategy['expectedReturn'] / 100],
+        [strategy['expectedVolatility'] / 100],
+        paths=paths,
+        years=years,
+        seed=seed
+    )
+
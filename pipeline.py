@@ -0,0 +1,120 @@
+import os
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pandas as pd
+from kmi30_data import get_kmi30_analysis_async, get_price_history_async
+from ai_agent import get_stock_recommendations_async, ERROR_PREFIX
+from snapshot_store import snapshot_version
+from shared_cache import shared_cache
+import async_runner
+
+# How long upstream results are shared between sessions and workers (seconds)
+KMI30_CACHE_TTL = int(os.getenv("KMI30_CACHE_TTL", "300"))
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", "3600"))
+PRICE_HISTORY_TTL = int(os.getenv("PRICE_HISTORY_TTL", "21600"))
+
+# Per-stage timeouts for the assessment (seconds)
+ANALYSIS_TIMEOUT = float(os.getenv("ANALYSIS_TIMEOUT", "120"))
+RECOMMENDATION_TIMEOUT = float(os.getenv("RECOMMENDATION_TIMEOUT", "120"))
+PRICE_HISTORY_TIMEOUT = float(os.getenv("PRICE_HISTORY_TIMEOUT", "60"))
+
+
+class StageTimeout(Exception):
+    """Raised when a pipeline stage does not finish within its timeout"""
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"{stage} did not finish within {timeout:.0f}s")
+        self.stage = stage
+
+
+def recommendations_key(risk_profile: str, kmi30_data: pd.DataFrame, answers: Dict[int, int]) -> str:
+    """Shared cache key for AI recommendations with identical inputs"""
+    answers_key = ",".join(f"{q}={p}" for q, p in sorted(answers.items()))
+    return f"ai:{risk_profile}:{snapshot_version(kmi30_data)}:{answers_key}"
+
+
+async def _stage(name: str, coroutine: Any, timeout: float) -> Any:
+    try:
+        return await asyncio.wait_for(coroutine, timeout)
+    except asyncio.TimeoutError:
+        raise StageTimeout(name, timeout) from None
+
+
+async def get_shared_kmi30_analysis_async(timeout: float = ANALYSIS_TIMEOUT) -> pd.DataFrame:
+    """Get KMI-30 analysis, fetching from upstream at most once per TTL across all workers"""
+    return await _stage(
+        "KMI-30 analysis",
+        shared_cache.get_or_refresh_async("kmi30:analysis", get_kmi30_analysis_async, ttl=KMI30_CACHE_TTL),
+        timeout
+    )
+
+
+async def get_shared_price_history_async(tickers: List[str], timeout: float = PRICE_HISTORY_TIMEOUT) -> pd.DataFrame:
+    """Get daily closes for the tickers, fetching from upstream at most once per TTL across all workers"""
+    return await _stage(
+        "Price history",
+        shared_cache.get_or_refresh_async(
+            "prices:eod:" + ",".join(sorted(tickers)),
+            lambda: get_price_history_async(tickers),
+            ttl=PRICE_HISTORY_TTL,
+            cache_if=lambda closes: closes is not None and not closes.empty
+        ),
+        timeout
+    )
+
+
+async def get_shared_recommendations_async(
+    risk_profile: str,
+    kmi30_data: pd.DataFrame,
+    answers: Dict[int, int],
+    timeout: float = RECOMMENDATION_TIMEOUT
+) -> str:
+    """Get AI recommendations, reusing results for identical inputs across sessions and workers"""
+    return await _stage(
+        "AI recommendations",
+        shared_cache.get_or_refresh_async(
+            recommendations_key(risk_profile, kmi30_data, answers),
+            lambda: get_stock_recommendations_async(risk_profile, kmi30_data, answers),
+            ttl=AI_CACHE_TTL,
+            cache_if=lambda text: bool(text) and not text.startswith(ERROR_PREFIX)
+        ),
+        timeout
+    )
+
+
+def run_assessment(
+    risk_profile: str,
+    answers: Dict[int, int],
+    on_analysis: Optional[Callable[[pd.DataFrame, pd.DataFrame], None]] = None,
+    is_cancelled: Optional[Callable[[], bool]] = None
+) -> Tuple[pd.DataFrame, str]:
+    """
+    Fetch KMI-30 analysis and AI recommendations for a completed assessment
+    The stages run on the shared pipeline loop; this thread only waits for them.
+    Args: risk_profile - Investor risk profile
+          answers - Points per question
+          on_analysis - Called in this thread with the analysis and the daily closes
+                        of its tickers (empty if unavailable) before the AI stage starts
+          is_cancelled - Polled while waiting; returning True cancels the running stage
+    Returns: Tuple of (KMI-30 analysis, AI recommendations)
+    Raises: StageTimeout if a stage takes too long, asyncio.CancelledError if cancelled
+    """
+    try:
+        kmi30_data = async_runner.run(get_shared_kmi30_analysis_async(), is_cancelled=is_cancelled)
+        tickers = [ticker.split('.')[0] for ticker in kmi30_data['Ticker']]
+        try:
+            closes = async_runner.run(get_shared_price_history_async(tickers), is_cancelled=is_cancelled)
+        except StageTimeout as e:
+            # Price history only enriches the analysis, so carry on without it
+            print(f"{e}, continuing without price history")
+            closes = pd.DataFrame()
+        if on_analysis is not None:
+            on_analysis(kmi30_data, closes)
+        recommendations = async_runner.run(
+            get_shared_recommendations_async(risk_profile, kmi30_data, answers),
+            is_cancelled=is_cancelled
+        )
+    except asyncio.CancelledError:
+        print("Assessment abandoned, cancelled pipeline")
+        raise
+    return kmi30_data, recommendations
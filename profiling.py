@@ -0,0 +1,233 @@
+"""
+On-demand sampling profiler for individual sessions
+
+Profiling is off unless PROFILING_TOKEN is set and an admin opens the app
+with ?profile=<token>. Each profiled rerun samples the session's script
+thread, plus any worker threads running @profiled functions on its behalf,
+and writes a collapsed-stack file (for flamegraph.pl / inferno) and a
+speedscope JSON file. Only the most recent PROFILE_RETENTION captures are
+kept. When no profile is active, @profiled costs a single ContextVar lookup.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import inspect
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Admin token that enables profiling for a session (profiling is unavailable if unset)
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+
+# Where captures are written and how many are kept
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "shariastockpro_profiles"))
+PROFILE_RETENTION = int(os.getenv("PROFILE_RETENTION", "50"))
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Profiler of the current session's work; copied into asyncio tasks and to_thread workers
+_active: ContextVar[Optional['SamplingProfiler']] = ContextVar('active_profiler', default=None)
+
+Frame = Tuple[str, str, int]
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of a set of threads at a fixed interval
+
+    Threads are attached while they do work for the profiled request, so
+    other sessions sharing the process do not show up in the capture.
+    """
+
+    def __init__(self, name: str, interval: float = SAMPLE_INTERVAL):
+        self.name = name
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._threads: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{name}", daemon=True)
+
+    def attach(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] += 1
+
+    def detach(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def start(self) -> 'SamplingProfiler':
+        self.started = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    @staticmethod
+    def _stack(frame: Any) -> Tuple[Frame, ...]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = list(self._threads)
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[self._stack(frame)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format: 'root;caller;callee count' per line"""
+        return "\n".join(
+            ";".join(f"{name} ({os.path.basename(path)}:{line})" for name, path, line in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        ) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Stacks as a speedscope sampled profile, weighted in seconds"""
+        frames: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, count in self.stacks.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * self.interval)
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'name': self.name,
+            'exporter': 'shariastockpro-profiling',
+            'shared': {'frames': [{'name': name, 'file': path, 'line': line} for name, path, line in frames]},
+            'profiles': [{
+                'type': 'sampled',
+                'name': self.name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
+
+
+class ProfileStore:
+    """Writes captures to disk, keeping only the most recent ones"""
+
+    def __init__(self, directory: str = PROFILE_DIR, retention: int = PROFILE_RETENTION):
+        self.directory = directory
+        self.retention = retention
+        self._lock = threading.Lock()
+
+    def save(self, profiler: SamplingProfiler) -> str:
+        """
+        Write a capture as collapsed stacks and speedscope JSON
+        Returns: Path of the speedscope file
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{profiler.name}")
+        with open(stem + ".collapsed", 'w') as f:
+            f.write(profiler.collapsed())
+        with open(stem + ".speedscope.json", 'w') as f:
+            json.dump(profiler.speedscope(), f)
+        self._prune()
+        print(f"Profile {profiler.name}: {profiler.elapsed:.3f}s, {profiler.samples} samples -> {stem}.speedscope.json")
+        return stem + ".speedscope.json"
+
+    def _prune(self) -> None:
+        with self._lock:
+            captures = self.recent()
+            for path in captures[self.retention:]:
+                for stale in (path, path[:-len(".speedscope.json")] + ".collapsed"):
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+
+    def recent(self, name: str = "") -> List[str]:
+        """Get speedscope files, newest first, optionally only those whose name contains a string"""
+        paths = sorted(glob.glob(os.path.join(self.directory, "*.speedscope.json")), reverse=True)
+        return [p for p in paths if name in os.path.basename(p)]
+
+
+# Shared by every session in this process
+profile_store = ProfileStore()
+
+
+def is_profiling() -> bool:
+    """Check whether the current request is being profiled"""
+    return _active.get() is not None
+
+
+@contextmanager
+def profile(name: str) -> Iterator[Optional[SamplingProfiler]]:
+    """
+    Profile a request and save the capture when it finishes (or raises)
+    Nested calls inside an active profile are part of the outer capture.
+    """
+    if _active.get() is not None:
+        yield _active.get()
+        return
+
+    ident = threading.get_ident()
+    profiler = SamplingProfiler(name)
+    profiler.attach(ident)
+    token = _active.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active.reset(token)
+        profile_store.save(profiler)
+
+
+@contextmanager
+def _attached(profiler: SamplingProfiler) -> Iterator[None]:
+    ident = threading.get_ident()
+    profiler.attach(ident)
+    try:
+        yield
+    finally:
+        profiler.detach(ident)
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Include a function's thread in the active profile, e.g. for work done in to_thread workers
+    Adds only a ContextVar lookup when the request is not being profiled.
+    """
+    if inspect.iscoroutinefunction(func):
+        # Coroutines run on the shared pipeline loop, which also serves other sessions
+        # and idles in select(); attaching it would sample all of that. Decorate the
+        # blocking functions the coroutine runs in to_thread workers instead.
+        raise TypeError(f"@profiled does not support coroutine functions ({func.__qualname__})")
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        with _attached(profiler):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,260 @@
+import os
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable
+
+# Rough characters-per-token ratio for Gemini models on English/tabular text
+CHARS_PER_TOKEN = 4
+
+# Default input token budget for the prompt (override with PROMPT_TOKEN_BUDGET)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
+
+# Maximum number of stock rows we ever send, even if the budget allows more
+MAX_STOCK_ROWS = 15
+
+# Output-length presets: trade answer length for response time
+OUTPUT_PRESETS = {
+    'brief': {
+        'max_output_tokens': 700,
+        'instructions': "Keep the whole answer under 350 words. Use short bullet points.",
+    },
+    'standard': {
+        'max_output_tokens': 1300,
+        'instructions': "Keep the whole answer under 700 words.",
+    },
+    'detailed': {
+        'max_output_tokens': 2000,
+        'instructions': "Be thorough but avoid repeating the input data.",
+    },
+}
+
+# Default preset per risk profile (override for all profiles with OUTPUT_PRESET)
+PROFILE_OUTPUT_PRESETS = {
+    'conservative': 'brief',
+    'moderate': 'standard',
+    'aggressive': 'detailed',
+}
+
+# Column order and short labels for the compact stock table
+COMPACT_COLUMNS = [
+    ('Ticker', 'Tkr'),
+    ('Sector', 'Sector'),
+    ('Current Price', 'Px'),
+    ('Summary', 'Sig'),
+    ('RSI', 'RSI'),
+    ('MACD', 'MACD'),
+    ('MACD Signal', 'MACDs'),
+    ('ADX', 'ADX'),
+    ('Volume', 'Vol'),
+]
+
+SUMMARY_ABBREVIATIONS = {
+    'STRONG_BUY': 'SB',
+    'BUY': 'B',
+    'NEUTRAL': 'N',
+    'SELL': 'S',
+    'STRONG_SELL': 'SS',
+}
+
+# Per-call statistics for the most recent Gemini calls
+call_stats = deque(maxlen=100)
+
+FULL_GUIDELINES = """Please provide recommendations in both English and Urdu, following these principles:
+
+1. Shariah Compliance:
+   - Business Screening: Ensure companies are not involved in prohibited industries
+   - Financial Ratio Screening: Debt/Total Assets < 33%, Cash+Interest-Bearing Securities/Total Assets < 33%
+   - Non-permissible Income < 5%
+
+2. Smart Beta Strategy Application:
+   - Value: Low P/E or P/B ratios
+   - Momentum: Strong recent price trends
+   - Quality: High profitability (ROE, margin) and low debt
+   - Low Volatility: Low beta or price swings
+   - Size: Consider market capitalization
+
+3. Portfolio Construction:
+   - Diversification across sectors
+   - Limit concentration in any single stock
+   - Consider market fundamentals (Market Cap, P/E, Dividend Yield, ROE, Beta, Volume)
+   - Factor-based weighting (Value: 30%, Quality: 30%, Momentum: 20%, Low Volatility: 20%)
+
+4. Rebalancing Strategy:
+   - Quarterly rebalancing
+   - Trigger rebalancing if:
+     * Asset weight drifts >10% from target
+     * Stock becomes non-compliant
+     * Factor scores change significantly
+   - Consider transaction costs"""
+
+CONDENSED_GUIDELINES = """Answer in English and Urdu. Apply: Shariah screening (Debt/Assets <33%, Cash+IBS/Assets <33%, non-permissible income <5%); smart beta factors (Value 30%, Quality 30%, Momentum 20%, Low Volatility 20%); sector diversification with no single-stock concentration; quarterly rebalancing, or on >10% weight drift, non-compliance or factor change."""
+
+RESPONSE_FORMAT = """Format your response as:
+1. Overall Market Analysis
+2. Shariah Compliance Check
+3. Top 3 Stock Recommendations with:
+   - Factor Analysis
+   - Technical Indicators
+   - Risk Assessment
+   - Suggested Portfolio Weight
+4. Diversification Strategy
+5. Rebalancing Recommendations
+6. Risk Management Advice"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text"""
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+def get_output_preset(risk_profile: str) -> Dict[str, Any]:
+    """Get the output-length preset for a risk profile"""
+    preset_name = os.getenv("OUTPUT_PRESET") or PROFILE_OUTPUT_PRESETS.get(risk_profile, 'standard')
+    if preset_name not in OUTPUT_PRESETS:
+        preset_name = 'standard'
+    return {'name': preset_name, **OUTPUT_PRESETS[preset_name]}
+
+
+def _format_number(value: Any) -> str:
+    """Format a numeric cell as compactly as possible"""
+    if isinstance(value, str):
+        return value.replace('N/A', '-')
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return '-'
+    if value != value:  # NaN
+        return '-'
+    magnitude = abs(value)
+    if magnitude >= 1e9:
+        return f"{value / 1e9:.1f}B"
+    if magnitude >= 1e6:
+        return f"{value / 1e6:.1f}M"
+    if magnitude >= 1e4:
+        return f"{value / 1e3:.0f}K"
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+def format_compact_table(stocks: List[Dict[str, Any]]) -> str:
+    """
+    Encode stock rows as a pipe-separated table
+    Args: stocks - List of stock records with KMI-30 analysis columns
+    Returns: Table with a legend line, a header line and one line per stock
+    """
+    legend = "Sig: SB=STRONG_BUY B=BUY N=NEUTRAL S=SELL SS=STRONG_SELL; Vol in K/M/B"
+    lines = [legend, "|".join(label for _, label in COMPACT_COLUMNS)]
+    for stock in stocks:
+        cells = []
+        for column, _ in COMPACT_COLUMNS:
+            value = stock.get(column, 'N/A')
+            if column == 'Ticker':
+                cells.append(str(value).replace('.KAR', ''))
+            elif column == 'Sector':
+                cells.append(value if isinstance(value, str) and value != 'N/A' else '-')
+            elif column == 'Summary':
+                cells.append(SUMMARY_ABBREVIATIONS.get(value, '-'))
+            else:
+                cells.append(_format_number(value))
+        lines.append("|".join(cells))
+    return "\n".join(lines)
+
+
+def build_prompt(
+    risk_profile: str,
+    user_profile: Dict[str, str],
+    stocks: List[Dict[str, Any]],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    count_tokens: Optional[Callable[[str], int]] = None,
+    describe: Optional[Callable[[List[Dict[str, Any]]], str]] = None
+) -> Dict[str, Any]:
+    """
+    Build the recommendation prompt so that it fits within a token budget
+    Args: risk_profile - Investor risk profile
+          user_profile - Labelled answers from the risk questionnaire
+          stocks - Candidate stock records, best first
+          token_budget - Maximum number of input tokens
+          count_tokens - Optional exact token counter, defaults to estimate_tokens
+          describe - Optional function summarizing the sector mix and correlation of the included rows
+    Returns: Dict with the prompt, its token count, number of stock rows and output preset
+    """
+    count_tokens = count_tokens or estimate_tokens
+    preset = get_output_preset(risk_profile)
+
+    profile_lines = "\n".join(f"- {label}: {value}" for label, value in user_profile.items())
+    header = f"""As an Islamic finance expert and AI-driven fund manager, analyze these KMI-30 stocks for a {risk_profile} investor:
+
+User Profile:
+{profile_lines}
+"""
+    footer = f"""
+{RESPONSE_FORMAT}
+
+Focus on stocks that match the user's risk profile while maintaining Shariah compliance and optimal diversification. {preset['instructions']}"""
+
+    summaries: Dict[int, str] = {}
+
+    def render(guidelines: str, rows: int) -> str:
+        table = format_compact_table(stocks[:rows])
+        if describe is not None and rows not in summaries:
+            summaries[rows] = describe(stocks[:rows])
+        diversification = summaries.get(rows, "")
+        context = f"\nDiversification Data:\n{diversification}\n" if diversification else ""
+        return f"{header}\nTop {rows} Stocks Based on Technical Analysis:\n{table}\n{context}\n{guidelines}\n{footer}"
+
+    candidates = stocks[:MAX_STOCK_ROWS]
+    guidelines = FULL_GUIDELINES
+    # Fall back to the condensed guidelines if the full ones leave no room for stock rows
+    if count_tokens(render(guidelines, min(len(candidates), 1))) > token_budget:
+        guidelines = CONDENSED_GUIDELINES
+
+    # Add stock rows until the budget is exhausted (always keep at least one)
+    rows = min(len(candidates), 1)
+    prompt = render(guidelines, rows)
+    tokens = count_tokens(prompt)
+    while rows < len(candidates):
+        next_prompt = render(guidelines, rows + 1)
+        next_tokens = count_tokens(next_prompt)
+        if next_tokens > token_budget:
+            break
+        rows, prompt, tokens = rows + 1, next_prompt, next_tokens
+
+    return {
+        'prompt': prompt,
+        'prompt_tokens': tokens,
+        'stock_rows': rows,
+        'condensed': guidelines is CONDENSED_GUIDELINES,
+        'preset': preset,
+    }
+
+
+def record_call(
+    prompt_tokens: int,
+    output_tokens: int,
+    latency: float,
+    preset: str,
+    stock_rows: int,
+    count_latency: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Record statistics for a single model call
+    Args: latency - Seconds spent generating the response
+          count_latency - Seconds spent counting prompt tokens before the request
+    """
+    stats = {
+        'timestamp': time.time(),
+        'prompt_tokens': prompt_tokens,
+        'output_tokens': output_tokens,
+        'latency': round(latency, 3),
+        'count_latency': round(count_latency, 3),
+        'preset': preset,
+        'stock_rows': stock_rows,
+    }
+    call_stats.append(stats)
+    print(f"Gemini call: {prompt_tokens} prompt tokens, {output_tokens} output tokens, "
+          f"{stats['latency']}s (+{stats['count_latency']}s counting), preset={preset}, rows={stock_rows}")
+    return stats
+
+
+def get_call_stats() -> List[Dict[str, Any]]:
+    """Get statistics for the most recent model calls, oldest first"""
+    return list(call_stats)
@@ -0,0 +1,79 @@
+import streamlit as st
+import pandas as pd
+from typing import Dict, Any, List, Tuple
+
+# Number of table rows rendered per page
+PAGE_SIZE = 100
+
+# Background colour for each technical summary
+SUMMARY_STYLES = {
+    'STRONG_BUY': 'background-color: #dcfce7',
+    'BUY': 'background-color: #d1fae5',
+    'NEUTRAL': 'background-color: #fef9c3',
+    'SELL': 'background-color: #fee2e2',
+    'STRONG_SELL': 'background-color: #fecaca',
+}
+
+NUMERIC_COLUMNS = ['Current Price', 'RSI', 'MACD', 'MACD Signal', 'ADX', 'Volume']
+
+# Native column configuration for the results table
+COLUMN_CONFIG = {
+    'Ticker': st.column_config.TextColumn('Ticker'),
+    'Current Price': st.column_config.NumberColumn('Current Price', format="%.2f"),
+    'Summary': st.column_config.TextColumn('Summary'),
+    'RSI': st.column_config.NumberColumn('RSI', format="%.2f"),
+    'MACD': st.column_config.NumberColumn('MACD', format="%.2f"),
+    'MACD Signal': st.column_config.NumberColumn('MACD Signal', format="%.2f"),
+    'ADX': st.column_config.NumberColumn('ADX', format="%.2f"),
+    'Volume': st.column_config.NumberColumn('Volume', format="%d"),
+}
+
+
+def build_results_view(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Precompute everything the results table needs from a data snapshot
+    Args: df - KMI-30 analysis DataFrame
+    Returns: Dict with the display frame, summary style column, summary counts and page count
+    """
+    display = df.copy()
+    # 'N/A' strings become missing values so numeric columns get native formatting
+    for column in NUMERIC_COLUMNS:
+        if column in display.columns:
+            display[column] = pd.to_numeric(display[column], errors='coerce')
+
+    styles = display['Summary'].map(SUMMARY_STYLES).fillna('')
+
+    counts = display['Summary'].value_counts()
+    summary_counts: List[Tuple[str, int]] = [
+        (rec, int(count)) for rec, count in counts.items() if rec != 'N/A'
+    ]
+
+    return {
+        'display': display,
+        'styles': styles,
+        'summary_counts': summary_counts,
+        'pages': max(1, -(-len(display) // PAGE_SIZE)),
+    }
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_results_view(version: str, _df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Get the precomputed results view for a snapshot, shared across reruns and sessions
+    Args: version - Snapshot version from the snapshot store, computed once per snapshot
+          _df - The snapshot itself (not hashed)
+    """
+    return build_results_view(_df)
+
+
+def style_page(view: Dict[str, Any], page: int = 1) -> Any:
+    """
+    Get a styled page of the results table
+    Args: view - Precomputed results view
+          page - 1-based page number
+    Returns: pandas Styler for the requested page
+    """
+    start = (page - 1) * PAGE_SIZE
+    frame = view['display'].iloc[start:start + PAGE_SIZE]
+    styles = view['styles'].iloc[start:start + PAGE_SIZE]
+    return frame.style.apply(lambda _: styles, subset=['Summary'])
@@ -0,0 +1,312 @@
+import os
+import time
+import asyncio
+import uuid
+import pickle
+import sqlite3
+import stat
+import tempfile
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def private_cache_dir() -> str:
+    """
+    Get a cache directory that only the current user can access
+    Cached values are unpickled, so other local users must not be able to write them.
+    Returns: Path of the directory (created with mode 0700)
+    Raises: PermissionError if the directory belongs to another user
+    """
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    home = os.path.expanduser("~")
+    if os.getenv("XDG_CACHE_HOME") or os.path.isdir(home):
+        directory = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(home, ".cache"), "shariastockpro")
+    else:
+        # No home directory (e.g. some containers): use a per-user directory in the temp directory
+        directory = os.path.join(tempfile.gettempdir(), f"shariastockpro-{uid}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if uid is not None:
+        info = os.lstat(directory)
+        if info.st_uid != uid or not stat.S_ISDIR(info.st_mode):
+            raise PermissionError(f"Cache directory {directory} is not owned by this user; set SHARED_CACHE_URL")
+        if info.st_mode & 0o077:
+            os.chmod(directory, 0o700)
+    return directory
+
+
+# Cache backend URL: redis://host:port/db, sqlite:///path/to/file.sqlite3 or memory://
+DEFAULT_CACHE_URL = os.getenv("SHARED_CACHE_URL") or "sqlite:///" + os.path.join(private_cache_dir(), "cache.sqlite3")
+
+# How often a waiting worker checks whether another worker finished a refresh
+POLL_INTERVAL = 0.2
+
+
+class InMemoryBackend:
+    """
+    Single-process backend with Redis-like semantics
+
+    Used as a local stand-in for Redis in tests and when no shared store is configured.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    def _live(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        item = self._values.get(key)
+        if item is not None and item[1] is not None and item[1] < time.time():
+            del self._values[key]
+            return None
+        return item
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._live(key)
+            return item[0] if item else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def acquire_lock(self, name: str, token: str, ttl: float) -> bool:
+        with self._lock:
+            if self._live(f"lock:{name}") is not None:
+                return False
+            self._values[f"lock:{name}"] = (token.encode(), time.time() + ttl)
+            return True
+
+    def release_lock(self, name: str, token: str) -> None:
+        with self._lock:
+            item = self._live(f"lock:{name}")
+            if item is not None and item[0] == token.encode():
+                del self._values[f"lock:{name}"]
+
+
+class SQLiteBackend:
+    """Backend shared by all processes on one host through a SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT, expires REAL)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires >= ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, sqlite3.Binary(value), now + ttl if ttl else None)
+        )
+        conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def acquire_lock(self, name: str, token: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO locks (name, token, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET token = excluded.token, expires = excluded.expires "
+            "WHERE locks.expires < ?",
+            (name, token, now + ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_lock(self, name: str, token: str) -> None:
+        self._conn().execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+
+class RedisBackend:
+    """Backend shared by all replicas through a Redis-protocol server"""
+
+    # Delete the lock only if we still own it
+    RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, url: str):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def acquire_lock(self, name: str, token: str, ttl: float) -> bool:
+        return bool(self.client.set(f"lock:{name}", token, nx=True, px=int(ttl * 1000)))
+
+    def release_lock(self, name: str, token: str) -> None:
+        self._release(keys=[f"lock:{name}"], args=[token])
+
+
+def backend_from_url(url: str) -> Any:
+    """
+    Create a cache backend from a URL
+    Args: url - redis://..., rediss://..., sqlite:///path or memory://
+    Returns: Backend instance
+    """
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith("memory://"):
+        return InMemoryBackend()
+    raise ValueError(f"Unsupported SHARED_CACHE_URL: {url}")
+
+
+class SharedCache:
+    """
+    Cross-process object cache with deduplicated refreshes
+
+    Only one worker at a time runs the loader for a key; the others wait for
+    its result instead of hitting PSX, TradingView or Gemini themselves.
+    """
+
+    def __init__(self, backend: Any, prefix: str = "ssp:"):
+        self.backend = backend
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def get_object(self, key: str) -> Any:
+        """Get a cached object, or None if missing or expired"""
+        data = self.backend.get(self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set_object(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Cache an object for ttl seconds (forever if ttl is None)"""
+        self.backend.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl)
+
+    def get_or_refresh(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        ttl: float,
+        lock_ttl: float = 120,
+        cache_if: Callable[[Any], bool] = lambda value: value is not None
+    ) -> Any:
+        """
+        Get a cached object, refreshing it from upstream at most once across workers
+        Args: key - Cache key
+              loader - Function that fetches a fresh value from upstream
+              ttl - Seconds the fresh value stays cached
+              lock_ttl - Seconds before a crashed worker's refresh lock expires
+              cache_if - Predicate deciding whether a loaded value may be cached
+        Returns: Cached or freshly loaded value
+        """
+        value = self.get_object(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        token = uuid.uuid4().hex
+        deadline = time.time() + lock_ttl
+        while time.time() < deadline:
+            if self.backend.acquire_lock(self.prefix + key, token, lock_ttl):
+                try:
+                    # Another worker may have finished while we were acquiring the lock
+                    value = self.get_object(key)
+                    if value is not None:
+                        return value
+                    self.refreshes += 1
+                    value = loader()
+                    if cache_if(value):
+                        self.set_object(key, value, ttl)
+                    return value
+                finally:
+                    self.backend.release_lock(self.prefix + key, token)
+
+            time.sleep(POLL_INTERVAL)
+            value = self.get_object(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        print(f"Timed out waiting for shared refresh of {key}, loading locally")
+        return loader()
+
+    async def get_or_refresh_async(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        lock_ttl: float = 120,
+        cache_if: Callable[[Any], bool] = lambda value: value is not None
+    ) -> Any:
+        """
+        Async version of get_or_refresh that never blocks the event loop
+        Args: key - Cache key
+              loader - Coroutine function that fetches a fresh value from upstream
+              ttl - Seconds the fresh value stays cached
+              lock_ttl - Seconds before a crashed worker's refresh lock expires
+              cache_if - Predicate deciding whether a loaded value may be cached
+        Returns: Cached or freshly loaded value
+        """
+        value = await asyncio.to_thread(self.get_object, key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        token = uuid.uuid4().hex
+        deadline = time.time() + lock_ttl
+        while time.time() < deadline:
+            if await asyncio.to_thread(self.backend.acquire_lock, self.prefix + key, token, lock_ttl):
+                try:
+                    value = await asyncio.to_thread(self.get_object, key)
+                    if value is not None:
+                        return value
+                    self.refreshes += 1
+                    value = await loader()
+                    if cache_if(value):
+                        await asyncio.to_thread(self.set_object, key, value, ttl)
+                    return value
+                finally:
+                    # Released synchronously so a cancelled refresh frees the lock immediately
+                    self.backend.release_lock(self.prefix + key, token)
+
+            await asyncio.sleep(POLL_INTERVAL)
+            value = await asyncio.to_thread(self.get_object, key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        print(f"Timed out waiting for shared refresh of {key}, loading locally")
+        return await loader()
+
+
+# Shared by every session in this process and, through the backend, by other workers
+shared_cache = SharedCache(backend_from_url(DEFAULT_CACHE_URL))
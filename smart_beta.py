@@ -0,0 +1,347 @@
+import threading
+import numpy as np
+from typing import List, Dict, Any, Mapping, Optional, Sequence
+from fundamentals import FundamentalsTable, load_fundamentals, FIELDS
+from diversification import RollingCorrelation, correlation_tracker, sector_concentration
+
+# Smart beta strategies
+strategies = [
+    {
+        'name': "Quality",
+        'description': "High-quality companies with strong fundamentals",
+        'factors': ["quality"],
+        'riskProfile': "conservative",
+        'expectedReturn': 8.5,
+        'expectedVolatility': 12.0
+    },
+    {
+        'name': "Value",
+        'description': "Undervalued companies trading below intrinsic value",
+        'factors': ["value"],
+        'riskProfile': "moderate",
+        'expectedReturn': 9.2,
+        'expectedVolatility': 15.5
+    },
+    {
+        'name': "Momentum",
+        'description': "Companies with strong price momentum",
+        'factors': ["momentum"],
+        'riskProfile': "aggressive",
+        'expectedReturn': 11.0,
+        'expectedVolatility': 18.0
+    },
+    {
+        'name': "Growth",
+        'description': "Companies with high growth potential",
+        'factors': ["growth"],
+        'riskProfile': "aggressive",
+        'expectedReturn': 12.5,
+        'expectedVolatility': 20.0
+    },
+    {
+        'name': "Low Volatility",
+        'description': "Stable companies with lower price volatility",
+        'factors': ["lowVolatility"],
+        'riskProfile': "conservative",
+        'expectedReturn': 7.8,
+        'expectedVolatility': 9.5
+    },
+    {
+        'name': "Quality Value",
+        'description': "High-quality companies at attractive valuations",
+        'factors': ["quality", "value"],
+        'riskProfile': "moderate",
+        'expectedReturn': 9.8,
+        'expectedVolatility': 13.5
+    },
+    {
+        'name': "Quality Momentum",
+        'description': "High-quality companies with positive momentum",
+        'factors': ["quality", "momentum"],
+        'riskProfile': "moderate",
+        'expectedReturn': 10.5,
+        'expectedVolatility': 14.8
+    }
+]
+
+# Scoring method for each strategy factor
+FACTOR_SCORERS = {
+    'quality': 'calculate_quality_score',
+    'value': 'calculate_value_score',
+    'momentum': 'calculate_momentum_score',
+    'growth': 'calculate_growth_score',
+    'lowVolatility': 'calculate_low_volatility_score',
+}
+
+# Input fields each factor depends on; price ticks only move momentum and volatility
+FACTOR_INPUTS = {
+    'quality': ['roe'],
+    'value': ['pe_ratio', 'pb_ratio'],
+    'momentum': ['momentum'],
+    'growth': ['revenue_growth'],
+    'lowVolatility': ['volatility'],
+}
+
+# Above this share of changed rows a ranking is re-sorted instead of patched
+PATCH_THRESHOLD = 0.25
+
+# Trading days of closes behind the price-derived factors (about six months)
+MOMENTUM_LOOKBACK = 126
+TRADING_DAYS = 252
+
+# Minimum daily returns needed before a symbol's price factors are replaced
+MIN_PRICE_OBSERVATIONS = 20
+
+def price_factors(closes: Any, lookback: int = MOMENTUM_LOOKBACK) -> Dict[str, Any]:
+    """
+    Derive momentum and volatility from daily closing prices
+    Args: closes - DataFrame with one row per trading day and one column per symbol, oldest first
+          lookback - Trading days used for both factors
+    Returns: Dict with symbols, momentum (% price change) and volatility (annualized %)
+    """
+    window = closes.tail(lookback + 1).ffill()
+    returns = window.pct_change(fill_method=None).iloc[1:]
+    momentum = (window.iloc[-1] / window.bfill().iloc[0] - 1) * 100
+    volatility = returns.std() * np.sqrt(TRADING_DAYS) * 100
+    valid = (returns.count() >= MIN_PRICE_OBSERVATIONS) & momentum.notna() & volatility.notna()
+    return {
+        'symbols': [str(s) for s in closes.columns[valid.to_numpy()]],
+        'momentum': momentum[valid].to_numpy(dtype=np.float64),
+        'volatility': volatility[valid].to_numpy(dtype=np.float64),
+    }
+
+class FactorScoreCache:
+    """
+    Factor, strategy and ranking scores that are patched incrementally
+
+    Field updates mark only the factors that depend on them dirty, and only the
+    changed rows of those factors, the strategies using them and the affected
+    rankings are recomputed. Fundamental columns stay shared with the
+    FundamentalsTable until a field is first updated (copy on write).
+    """
+
+    def __init__(self, engine: 'SmartBetaEngine'):
+        self.engine = engine
+        self.table = engine.fundamentals
+        self.values = {field: self.table[field] for field in FIELDS}
+        self._owned = set()
+        self.factor_scores = {
+            factor: np.asarray(engine.calculate_factor_score(factor, self.values), dtype=np.float64)
+            for factor in FACTOR_SCORERS
+        }
+        self.strategy_scores = {s['name']: self._strategy_score(s) for s in strategies}
+        self.rankings: Dict[str, Dict[str, Any]] = {}
+        # Incremented on every update so callers can tell when rankings changed
+        self.revision = 0
+
+    def _strategy_score(self, strategy: Dict[str, Any], rows: Any = slice(None)) -> np.ndarray:
+        total = sum(self.factor_scores[f][rows] for f in strategy['factors'])
+        return total / len(strategy['factors'])
+
+    def _rank(self, risk_profile: str) -> Dict[str, Any]:
+        suitable = [s for s in strategies if s['riskProfile'] == risk_profile]
+        matrix = np.vstack([self.strategy_scores[s['name']] for s in suitable])
+        best = matrix.argmax(axis=0)
+        best_scores = matrix[best, np.arange(matrix.shape[1])]
+        order = np.argsort(-best_scores, kind='stable')
+        return {'strategies': suitable, 'best': best, 'best_scores': best_scores,
+                'order': order, 'sorted_scores': best_scores[order]}
+
+    def ranking(self, risk_profile: str) -> Dict[str, Any]:
+        """Get the ranking of all stocks for a risk profile"""
+        if risk_profile not in self.rankings:
+            self.rankings[risk_profile] = self._rank(risk_profile)
+        return self.rankings[risk_profile]
+
+    def update(self, symbols: Sequence[str], **fields: Sequence[float]) -> Dict[str, Any]:
+        """
+        Update input fields for some stocks and rescore only what depends on them
+        Args: symbols - Symbols whose fields changed
+              fields - New values per field, e.g. momentum=[...], volatility=[...]
+        Returns: Dict with the number of changed rows and the recomputed factors and strategies
+        """
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fundamentals fields: {', '.join(sorted(unknown))}")
+        index = self.table.index
+        # The last value wins if a symbol appears more than once
+        positions = list({index[s]: (i, index[s]) for i, s in enumerate(symbols) if s in index}.values())
+        if not positions or not fields:
+            return {'rows': 0, 'factors': [], 'strategies': []}
+        source = np.array([p[0] for p in positions])
+        rows = np.array([p[1] for p in positions])
+
+        for field, new_values in fields.items():
+            if field not in self._owned:
+                self.values[field] = np.array(self.values[field], dtype=np.float64)
+                self._owned.add(field)
+            self.values[field][rows] = np.asarray(new_values, dtype=np.float64)[source]
+
+        self.revision += 1
+        dirty_factors = [f for f, inputs in FACTOR_INPUTS.items() if set(inputs) & set(fields)]
+        for factor in dirty_factors:
+            inputs = {field: self.values[field][rows] for field in FACTOR_INPUTS[factor]}
+            self.factor_scores[factor][rows] = self.engine.calculate_factor_score(factor, inputs)
+
+        dirty_strategies = [s for s in strategies if set(s['factors']) & set(dirty_factors)]
+        for strategy in dirty_strategies:
+            self.strategy_scores[strategy['name']][rows] = self._strategy_score(strategy, rows)
+
+        dirty_names = {s['name'] for s in dirty_strategies}
+        for profile, ranking in list(self.rankings.items()):
+            if dirty_names & {s['name'] for s in ranking['strategies']}:
+                self._patch(profile, ranking, rows)
+
+        return {'rows': len(rows), 'factors': dirty_factors, 'strategies': sorted(dirty_names)}
+
+    def _patch(self, profile: str, ranking: Dict[str, Any], rows: np.ndarray) -> None:
+        if len(rows) > PATCH_THRESHOLD * len(ranking['order']):
+            self.rankings[profile] = self._rank(profile)
+            return
+        matrix = np.vstack([self.strategy_scores[s['name']][rows] for s in ranking['strategies']])
+        best = matrix.argmax(axis=0)
+        scores = matrix[best, np.arange(len(rows))]
+        ranking['best'][rows] = best
+        ranking['best_scores'][rows] = scores
+
+        # Take the changed rows out of the ranking and insert them at their new positions
+        keep = ~np.isin(ranking['order'], rows)
+        order = ranking['order'][keep]
+        sorted_scores = ranking['sorted_scores'][keep]
+        new_order = np.lexsort((rows, -scores))
+        new_rows, new_scores = rows[new_order], scores[new_order]
+        # Order by (-score, row) like the stable full sort, so equal scores keep row order
+        left = np.searchsorted(-sorted_scores, -new_scores, side='left')
+        right = np.searchsorted(-sorted_scores, -new_scores, side='right')
+        positions = np.array([
+            lo + np.searchsorted(order[lo:hi], row) if hi > lo else lo
+            for lo, hi, row in zip(left, right, new_rows)
+        ], dtype=np.intp)
+        ranking['order'] = np.insert(order, positions, new_rows)
+        ranking['sorted_scores'] = np.insert(sorted_scores, positions, new_scores)
+
+    def stock(self, i: int) -> Dict[str, Any]:
+        """Get one stock with its current field values"""
+        stock = {'symbol': str(self.table.symbols[i]), 'name': str(self.table.names[i])}
+        for field in FIELDS:
+            stock[field] = float(self.values[field][i])
+        return stock
+
+class SmartBetaEngine:
+    def __init__(self, fundamentals: Optional[FundamentalsTable] = None):
+        # The fundamentals table is loaded once per process and shared, not copied
+        self.fundamentals = fundamentals if fundamentals is not None else load_fundamentals()
+        self._scores: Optional[FactorScoreCache] = None
+        # One engine is shared by all sessions and rankings are patched in place, so
+        # readers and price updates hold this lock (reentrant: updates read scores too)
+        self.lock = threading.RLock()
+        self._prices_version: Optional[tuple] = None
+    
+    @property
+    def stocks(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [self.scores.stock(i) for i in range(len(self.fundamentals))]
+    
+    @property
+    def scores(self) -> FactorScoreCache:
+        with self.lock:
+            if self._scores is None:
+                self._scores = FactorScoreCache(self)
+            return self._scores
+    
+    # Scores accept a single stock dict or the whole table and work element-wise
+    def calculate_quality_score(self, stock: Mapping[str, Any]) -> Any:
+        roe_score = np.clip((stock['roe'] - 5) * 5, 0, 100)
+        return roe_score
+    
+    def calculate_value_score(self, stock: Mapping[str, Any]) -> Any:
+        pe_score = np.clip((30 - stock['pe_ratio']) * 4, 0, 100)
+        pb_score = np.clip((5 - stock['pb_ratio']) * 20, 0, 100)
+        return (pe_score + pb_score) / 2
+    
+    def calculate_momentum_score(self, stock: Mapping[str, Any]) -> Any:
+        return np.clip((stock['momentum'] + 20) * 1.67, 0, 100)
+    
+    def calculate_growth_score(self, stock: Mapping[str, Any]) -> Any:
+        return np.clip((stock['revenue_growth'] + 10) * 2.5, 0, 100)
+    
+    def calculate_low_volatility_score(self, stock: Mapping[str, Any]) -> Any:
+        return np.clip((30 - stock['volatility']) * 4, 0, 100)
+    
+    def calculate_factor_score(self, factor: str, stock: Mapping[str, Any]) -> Any:
+        return getattr(self, FACTOR_SCORERS[factor])(stock)
+    
+    def update_prices(
+        self,
+        symbols: Sequence[str],
+        momentum: Optional[Sequence[float]] = None,
+        volatility: Optional[Sequence[float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply an intraday price refresh without rescoring the fundamentals
+        Args: symbols - Symbols with new price-derived values
+              momentum - New momentum per symbol
+              volatility - New volatility per symbol
+        Returns: Summary of what was recomputed
+        """
+        fields = {}
+        if momentum is not None:
+            fields['momentum'] = momentum
+        if volatility is not None:
+            fields['volatility'] = volatility
+        with self.lock:
+            return self.scores.update(symbols, **fields)
+    
+    def update_from_closes(self, closes: Any) -> Dict[str, Any]:
+        """
+        Refresh momentum and volatility from daily closes, once per price history
+        Args: closes - Daily closes per symbol, e.g. from pipeline.get_shared_price_history_async
+        Returns: Summary of what was recomputed
+        """
+        if closes is None or closes.empty:
+            return {'rows': 0, 'factors': [], 'strategies': []}
+        version = (closes.index[-1], tuple(closes.columns))
+        with self.lock:
+            if version == self._prices_version:
+                return {'rows': 0, 'factors': [], 'strategies': []}
+            self._prices_version = version
+            factors = price_factors(closes)
+            return self.update_prices(factors['symbols'], momentum=factors['momentum'], volatility=factors['volatility'])
+    
+    def diversification(
+        self,
+        recommendations: List[Dict[str, Any]],
+        tracker: Optional[RollingCorrelation] = None,
+        pairs: int = 3
+    ) -> Dict[str, Any]:
+        """
+        Describe the sector concentration and correlation of a set of recommendations
+        Args: recommendations - Output of get_stock_recommendations
+              tracker - Correlation tracker, defaults to the process-wide one
+              pairs - Number of most-correlated pairs to return
+        Returns: Dict with sector concentration, average pairwise correlation and most-correlated pairs
+        """
+        tracker = tracker or correlation_tracker
+        symbols = [r['stock']['symbol'] for r in recommendations]
+        return {
+            'concentration': sector_concentration(symbols),
+            'average_correlation': tracker.average_correlation(symbols),
+            'most_correlated': tracker.most_correlated_pairs(pairs, symbols),
+        }
+    
+    def get_stock_recommendations(self, risk_profile: str, num_recommendations: int = 10) -> List[Dict[str, Any]]:
+        # Filter strategies based on risk profile
+        suitable_strategies = [s for s in strategies if s['riskProfile'] == risk_profile]
+        if not suitable_strategies or len(self.fundamentals) == 0:
+            return []
+        
+        with self.lock:
+            # Scores are computed once and patched incrementally on updates
+            ranking = self.scores.ranking(risk_profile)
+            
+            # Return top recommendations with the best strategy for each stock
+            return [{
+                'stock': self.scores.stock(i),
+                'strategy': ranking['strategies'][ranking['best'][i]]['name'],
+                'score': float(ranking['best_scores'][i])
+            } for i in ranking['order'][:num_recommendations]]
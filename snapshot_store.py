@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional
+import pandas as pd
+
+# Global memory cap for all snapshots (override with SNAPSHOT_STORE_MAX_MB)
+DEFAULT_MAX_BYTES = int(float(os.getenv("SNAPSHOT_STORE_MAX_MB", "256")) * 1024 * 1024)
+
+# Sessions not seen for this many seconds drop their references
+DEFAULT_SESSION_TTL = int(os.getenv("SNAPSHOT_SESSION_TTL", "3600"))
+
+# Minimum seconds between sweeps for expired sessions
+EXPIRY_SWEEP_INTERVAL = 60
+
+
+def snapshot_version(value: Any) -> str:
+    """
+    Get a content-derived version ID for a snapshot
+    Args: value - DataFrame or text to store
+    Returns: Version ID, identical for identical content
+    """
+    if isinstance(value, pd.DataFrame):
+        digest = hashlib.sha1()
+        digest.update(",".join(map(str, value.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(value.astype(str), index=True).values.tobytes())
+        return f"df-{digest.hexdigest()[:16]}"
+    return f"txt-{hashlib.sha1(str(value).encode()).hexdigest()[:16]}"
+
+
+def snapshot_size(value: Any) -> int:
+    """Get the approximate memory footprint of a snapshot in bytes"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+
+class SnapshotStore:
+    """
+    Process-wide store of immutable snapshots shared by all sessions
+
+    Sessions hold version IDs in st.session_state instead of their own copies.
+    Snapshots are reference-counted per session slot and evicted least recently
+    used first once the store exceeds its memory cap. Values returned by get()
+    are shared and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, session_ttl: int = DEFAULT_SESSION_TTL):
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self.total_bytes = 0
+        self.evictions = 0
+        self._last_sweep = time.time()
+        self._released: List[str] = []
+        self._release_listeners: List[Callable[[str], None]] = []
+
+    def put(self, value: Any) -> str:
+        """Store a snapshot and return its version ID"""
+        version = snapshot_version(value)
+        with self._lock:
+            if version in self._snapshots:
+                self._snapshots.move_to_end(version)
+                return version
+            size = snapshot_size(value)
+            self._snapshots[version] = {'value': value, 'size': size, 'refs': 0, 'created': time.time()}
+            self.total_bytes += size
+            self._sweep()
+            self._evict(keep=version)
+        self._notify_released()
+        return version
+
+    def get(self, version: Optional[str]) -> Any:
+        """Get a snapshot by version ID, or None if it was never stored or has been evicted"""
+        if version is None:
+            return None
+        with self._lock:
+            entry = self._snapshots.get(version)
+            if entry is None:
+                return None
+            self._snapshots.move_to_end(version)
+            return entry['value']
+
+    def acquire(self, session_id: str, slot: str, version: str) -> None:
+        """
+        Point a session slot at a snapshot version
+        Args: session_id - Streamlit session ID
+              slot - Name of the session state field (e.g. 'kmi30_data')
+              version - Snapshot version ID
+        """
+        with self._lock:
+            session = self._sessions.setdefault(session_id, {'slots': {}, 'last_seen': time.time()})
+            session['last_seen'] = time.time()
+            previous = session['slots'].get(slot)
+            if previous == version:
+                return
+            if previous is not None:
+                self._decref(previous)
+            session['slots'][slot] = version
+            if version in self._snapshots:
+                self._snapshots[version]['refs'] += 1
+
+    def touch(self, session_id: str) -> None:
+        """Mark a session as active so its references are kept"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session['last_seen'] = time.time()
+            self._sweep()
+        self._notify_released()
+
+    def release_session(self, session_id: str) -> None:
+        """Drop all references held by a session"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                for version in session['slots'].values():
+                    self._decref(version)
+            self._released.append(session_id)
+        self._notify_released()
+
+    def add_release_listener(self, callback: Callable[[str], None]) -> None:
+        """Call back with the session ID whenever a session is released or expires (registered once)"""
+        with self._lock:
+            if callback not in self._release_listeners:
+                self._release_listeners.append(callback)
+
+    def _notify_released(self) -> None:
+        with self._lock:
+            released, self._released = self._released, []
+            listeners = list(self._release_listeners)
+        for session_id in released:
+            for callback in listeners:
+                callback(session_id)
+
+    def session_footprint(self, session_id: str) -> Dict[str, Any]:
+        """
+        Get the memory attributed to a session
+        Returns: Dict with per-slot bytes, the session's total and its share of shared snapshots
+        """
+        with self._lock:
+            session = self._sessions.get(session_id, {'slots': {}})
+            slots = {}
+            shared_bytes = 0.0
+            for slot, version in session['slots'].items():
+                entry = self._snapshots.get(version)
+                size = entry['size'] if entry else 0
+                slots[slot] = {'version': version, 'bytes': size}
+                if entry:
+                    shared_bytes += size / max(1, entry['refs'])
+            return {
+                'slots': slots,
+                'referenced_bytes': sum(s['bytes'] for s in slots.values()),
+                'amortized_bytes': int(shared_bytes),
+            }
+
+    def report(self) -> Dict[str, Any]:
+        """Get a summary of store usage and per-session footprints"""
+        with self._lock:
+            session_ids = list(self._sessions)
+            summary = {
+                'snapshots': len(self._snapshots),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'sessions': len(session_ids),
+            }
+        summary['per_session'] = {sid: self.session_footprint(sid) for sid in session_ids}
+        return summary
+
+    def _decref(self, version: str) -> None:
+        entry = self._snapshots.get(version)
+        if entry is not None and entry['refs'] > 0:
+            entry['refs'] -= 1
+
+    def _expire_sessions(self) -> None:
+        cutoff = time.time() - self.session_ttl
+        for session_id in [sid for sid, s in self._sessions.items() if s['last_seen'] < cutoff]:
+            for version in self._sessions.pop(session_id)['slots'].values():
+                self._decref(version)
+            self._released.append(session_id)
+
+    def _sweep(self) -> None:
+        # Closed tabs never release their references, so expire idle sessions periodically
+        now = time.time()
+        if now - self._last_sweep >= min(EXPIRY_SWEEP_INTERVAL, self.session_ttl):
+            self._last_sweep = now
+            self._expire_sessions()
+
+    def _evict(self, keep: str) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+        self._expire_sessions()
+        # Unreferenced snapshots go first, then the least recently used referenced ones
+        for referenced in (False, True):
+            for version in list(self._snapshots):
+                if self.total_bytes <= self.max_bytes:
+                    return
+                entry = self._snapshots[version]
+                if version == keep or (entry['refs'] > 0) != referenced:
+                    continue
+                del self._snapshots[version]
+                self.total_bytes -= entry['size']
+                self.evictions += 1
+                if referenced:
+                    print(f"Snapshot store over capacity, evicted referenced snapshot {version}")
+
+
+# Shared by every session in this process
+store = SnapshotStore()
@@ -0,0 +1,114 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from alerts import AlertEngine, parse_rule
+
+
+def snapshot(rows):
+    """Analysis snapshot from (ticker, RSI, MACD, MACD Signal, Summary) tuples"""
+    return pd.DataFrame([{
+        'Ticker': f"{ticker}.KAR", 'Current Price': 100.0, 'Summary': summary, 'RSI': rsi,
+        'MACD': macd, 'MACD Signal': signal, 'ADX': 20.0, 'Volume': 1e5,
+    } for ticker, rsi, macd, signal, summary in rows])
+
+
+def matches(notifications):
+    return sorted((n['rule_id'], n['ticker']) for n in notifications)
+
+
+def test_parse_rule_reads_columns_operators_and_operands():
+    assert parse_rule("rsi < 30 and MACD crosses above MACD Signal and Summary == strong buy") == [
+        ('RSI', '<', 30.0),
+        ('MACD', 'crosses above', 'MACD Signal'),
+        ('Summary', '==', 'STRONG_BUY'),
+    ]
+    # The longer column name wins over its prefix
+    assert parse_rule("MACD Signal >= 1,000") == [('MACD Signal', '>=', 1000.0)]
+
+
+@pytest.mark.parametrize('expression', [
+    "RSI about 30",
+    "RSI < thirty",
+    "RSI crosses above 30",
+    "Summary > BUY",
+    "Summary == MAYBE",
+])
+def test_parse_rule_rejects_invalid_conditions(expression):
+    with pytest.raises(ValueError):
+        parse_rule(expression)
+
+
+def test_rules_match_only_when_all_their_conditions_do():
+    engine = AlertEngine()
+    one = engine.add_rule('u1', "RSI < 30")
+    two = engine.add_rule('u1', "RSI < 30 and MACD > 0")
+    three = engine.add_rule('u2', "RSI < 50 and MACD > 0 and Summary == BUY")
+
+    notifications = engine.evaluate(snapshot([
+        ('LUCK', 25, 1.0, 0.5, 'BUY'),
+        ('HUBC', 25, -1.0, 0.5, 'BUY'),
+        ('MEBL', 45, 1.0, 0.5, 'SELL'),
+        ('OGDC', 'N/A', 1.0, 0.5, 'BUY'),
+    ]))
+
+    assert matches(notifications) == [(one, 'HUBC'), (one, 'LUCK'), (two, 'LUCK'), (three, 'LUCK')]
+
+
+def test_crossovers_compare_against_the_previous_snapshot():
+    engine = AlertEngine()
+    above = engine.add_rule('u1', "MACD crosses above MACD Signal")
+    below = engine.add_rule('u1', "MACD crosses below MACD Signal")
+
+    assert engine.evaluate(snapshot([('LUCK', 50, 0.0, 1.0, 'BUY'), ('HUBC', 50, 2.0, 1.0, 'BUY')]), 'v1') == []
+    crossed = engine.evaluate(snapshot([('LUCK', 50, 2.0, 1.0, 'BUY'), ('HUBC', 50, 0.0, 1.0, 'BUY')]), 'v2')
+    assert matches(crossed) == [(above, 'LUCK'), (below, 'HUBC')]
+    # Staying above the signal is not a new crossing
+    assert engine.evaluate(snapshot([('LUCK', 50, 3.0, 1.0, 'BUY'), ('HUBC', 50, 0.0, 1.0, 'BUY')]), 'v3') == []
+
+
+def test_watchlists_accept_exchange_suffixes():
+    engine = AlertEngine()
+    suffixed = engine.add_rule('u1', "RSI < 30", ['LUCK.KAR'])
+    lower = engine.add_rule('u1', "RSI < 30", [' hubc '])
+
+    notifications = engine.evaluate(snapshot([
+        ('LUCK', 25, 0.0, 0.0, 'BUY'), ('HUBC', 25, 0.0, 0.0, 'BUY'), ('MEBL', 25, 0.0, 0.0, 'BUY'),
+    ]))
+
+    assert matches(notifications) == [(suffixed, 'LUCK'), (lower, 'HUBC')]
+    assert engine.get_rules('u1')[0]['tickers'] == ['LUCK']
+
+
+def test_users_are_notified_once_per_new_match():
+    engine = AlertEngine()
+    rule = engine.add_rule('u1', "RSI < 30")
+
+    assert matches(engine.evaluate(snapshot([('LUCK', 25, 0.0, 0.0, 'BUY')]), 'v1')) == [(rule, 'LUCK')]
+    assert engine.evaluate(snapshot([('LUCK', 20, 0.0, 0.0, 'BUY')]), 'v2') == []
+    assert engine.evaluate(snapshot([('LUCK', 40, 0.0, 0.0, 'BUY')]), 'v3') == []
+    assert matches(engine.evaluate(snapshot([('LUCK', 25, 0.0, 0.0, 'BUY')]), 'v4')) == [(rule, 'LUCK')]
+    assert len(engine.sink.get('u1')) == 2
+
+
+def test_duplicate_tickers_use_the_last_row():
+    engine = AlertEngine()
+    rule = engine.add_rule('u1', "RSI < 30 and MACD crosses above MACD Signal", ['LUCK'])
+
+    engine.evaluate(snapshot([('LUCK', 25, 2.0, 1.0, 'BUY'), ('LUCK', 25, 0.0, 1.0, 'BUY')]), 'v1')
+    notifications = engine.evaluate(snapshot([('LUCK', 25, 0.0, 1.0, 'BUY'), ('LUCK', 25, 2.0, 1.0, 'BUY')]), 'v2')
+
+    assert matches(notifications) == [(rule, 'LUCK')]
+
+
+def test_removed_users_lose_their_rules_and_notifications():
+    engine = AlertEngine()
+    engine.add_rule('u1', "RSI < 30")
+    kept = engine.add_rule('u2', "RSI < 30")
+    engine.evaluate(snapshot([('LUCK', 25, 0.0, 0.0, 'BUY')]), 'v1')
+
+    engine.remove_user('u1')
+
+    assert engine.get_rules('u1') == [] and engine.sink.get('u1') == []
+    assert [r['rule_id'] for r in engine.get_rules('u2')] == [kept]
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from diversification import RollingCorrelation
+from prompt_builder import build_prompt
+
+
+def make_closes(tickers, days):
+    rng = np.random.default_rng(1)
+    returns = rng.normal(0, 0.02, size=(days, len(tickers)))
+    return pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), columns=tickers,
+                        index=pd.date_range('2024-01-01', periods=days, freq='B'))
+
+
+def test_load_history_matches_the_correlation_of_daily_returns():
+    closes = make_closes(['LUCK', 'HUBC', 'MEBL'], 100)
+    tracker = RollingCorrelation(window=60)
+    tracker.load_history(closes)
+
+    expected = closes.tail(61).pct_change().dropna().corr().to_numpy()
+    assert tracker.count == 60
+    np.testing.assert_allclose(tracker.correlation().to_numpy(), expected, atol=1e-9)
+
+
+def test_load_history_keeps_the_window_when_the_universe_changes():
+    tracker = RollingCorrelation(window=20)
+    tracker.load_history(make_closes(['LUCK', 'HUBC'], 30))
+    tracker.load_history(make_closes(['LUCK', 'HUBC', 'OGDC'], 30))
+
+    assert tracker.symbols == ['LUCK', 'HUBC', 'OGDC']
+    assert tracker.count == 20
+
+
+def test_prompt_describes_only_the_included_rows():
+    stocks = [{'Ticker': f"T{i}.KAR", 'Summary': 'BUY', 'RSI': 50} for i in range(10)]
+    described = []
+
+    def describe(rows):
+        described.append(len(rows))
+        return f"{len(rows)} stocks"
+
+    built = build_prompt('moderate', {'Goal': 'Growth'}, stocks, token_budget=300, describe=describe)
+
+    assert 0 < built['stock_rows'] < len(stocks)
+    assert f"{built['stock_rows']} stocks" in built['prompt']
+
+
+def test_load_history_adds_only_new_days_when_the_history_extends(monkeypatch):
+    closes = make_closes(['LUCK', 'HUBC', 'MEBL'], 100)
+    tracker = RollingCorrelation(window=60)
+    tracker.load_history(closes.iloc[:97])
+
+    added = []
+    original = tracker._add_returns
+    monkeypatch.setattr(tracker, '_add_returns', lambda returns: (added.append(returns), original(returns)))
+    tracker.load_history(closes)
+
+    full = RollingCorrelation(window=60)
+    full.load_history(closes)
+    assert len(added) == 3
+    np.testing.assert_allclose(tracker.correlation().to_numpy(), full.correlation().to_numpy(), atol=1e-9)
@@ -0,0 +1,77 @@
+import io
+import pytest
+
+pd = pytest.importorskip("pandas")
+pa = pytest.importorskip("pyarrow")
+
+from wsgiref.handlers import SimpleHandler
+from wsgiref.util import setup_testing_defaults
+from wsgiref.validate import validator
+import pyarrow.parquet as pq
+import export
+from snapshot_store import store
+
+
+def request(path, **headers):
+    """Drive the WSGI app through wsgiref and return (status, headers, body)"""
+    environ = {'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '', 'REQUEST_METHOD': 'GET', **headers}
+    setup_testing_defaults(environ)
+    out = io.BytesIO()
+    handler = SimpleHandler(io.BytesIO(), out, io.StringIO(), environ)
+    handler.run(validator(export.application))
+    head, _, body = out.getvalue().partition(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+    return lines[0].split(' ', 1)[1], dict(line.split(': ', 1) for line in lines[1:]), body
+
+
+@pytest.fixture
+def snapshot():
+    df = pd.DataFrame({
+        'Ticker': ['LUCK.KAR', 'HUBC.KAR'], 'Current Price': [701.5, 'N/A'], 'Summary': ['BUY', 'SELL'],
+    })
+    return store.put(df), df
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'arrow', 'parquet'])
+def test_kmi30_export_downloads_through_wsgiref(snapshot, fmt, monkeypatch):
+    # Chunks smaller than the body so the response is streamed in several parts
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 64)
+    version, df = snapshot
+    status, headers, body = request(f"/export/kmi30/{version}.{fmt}")
+
+    assert status == '200 OK'
+    assert headers['Content-Type'] == export.FORMATS[fmt]
+    assert int(headers['Content-Length']) == len(body)
+    if fmt == 'csv':
+        assert body.decode().splitlines()[0] == 'Ticker,Current Price,Summary'
+    elif fmt == 'arrow':
+        assert pa.ipc.open_file(pa.BufferReader(body)).read_all().column('Ticker').to_pylist() == list(df['Ticker'])
+    else:
+        assert pq.read_table(pa.BufferReader(body)).num_rows == len(df)
+
+    status, _, body = request(f"/export/kmi30/{version}.{fmt}", HTTP_IF_NONE_MATCH=headers['ETag'])
+    assert status == '304 Not Modified' and body == b''
+
+
+def test_unknown_snapshot_is_not_found():
+    status, _, _ = request("/export/kmi30/missing.csv")
+    assert status == '404 Not Found'
+
+
+def test_rankings_are_not_served_by_the_export_process():
+    # The export process has no price-refreshed engine, so it must not serve stale rankings
+    status, _, _ = request("/export/rankings/moderate.csv")
+    assert status == '404 Not Found'
+
+
+def test_rankings_are_not_exported_from_placeholder_fundamentals():
+    np = pytest.importorskip("numpy")
+    from fundamentals import FundamentalsTable, FIELDS, _fallback_table
+    from smart_beta import SmartBetaEngine
+
+    assert export.get_rankings_export(SmartBetaEngine(_fallback_table()), 'moderate', 'csv') is None
+
+    symbols = np.array(['LUCK', 'HUBC'])
+    table = FundamentalsTable(symbols, symbols, {field: np.array([10.0, 20.0]) for field in FIELDS}, 'test')
+    csv = export.get_rankings_export(SmartBetaEngine(table), 'moderate', 'csv')
+    assert csv.decode().splitlines()[0].startswith('rank,symbol,name')
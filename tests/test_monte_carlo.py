@@ -0,0 +1,36 @@
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import monte_carlo
+from monte_carlo import simulate_portfolio, CHUNK_PATHS
+
+
+@pytest.mark.parametrize('bootstrap', [False, True])
+def test_parallel_simulation_matches_serial_for_the_same_seed(bootstrap, monkeypatch):
+    # The pool is skipped on single-CPU hosts; pretend there are two so it is exercised
+    if (os.cpu_count() or 1) < 2:
+        monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    rng = np.random.default_rng(5)
+    kwargs = dict(
+        expected_returns=[0.08, 0.12, 0.10],
+        volatilities=[0.15, 0.25, 0.20],
+        weights=[0.5, 0.3, 0.2],
+        correlation=[[1.0, 0.3, 0.2], [0.3, 1.0, 0.4], [0.2, 0.4, 1.0]],
+        history=rng.normal(0.01, 0.05, size=(60, 3)) if bootstrap else None,
+        paths=3 * CHUNK_PATHS + 123,
+        years=2,
+        seed=7,
+    )
+    serial = simulate_portfolio(**kwargs, parallel=False)
+    parallel = simulate_portfolio(**kwargs, parallel=True)
+
+    assert monte_carlo._pool is not None
+    assert parallel == serial
+
+
+def test_seed_changes_the_outcome():
+    first = simulate_portfolio([0.1], [0.2], paths=2000, years=1, seed=1)
+    second = simulate_portfolio([0.1], [0.2], paths=2000, years=1, seed=2)
+    assert first['terminal'] != second['terminal']
@@ -0,0 +1,108 @@
+import os
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("bs4")
+pytest.importorskip("tradingview_ta")
+pytest.importorskip("dotenv")
+pytest.importorskip("google.generativeai")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import numpy as np
+import pandas as pd
+import ai_agent
+import pipeline
+from shared_cache import SharedCache, InMemoryBackend
+
+
+class LoopBoundModel:
+    """Fake Gemini model whose async client, like grpc.aio, only works on the loop it was created on"""
+
+    def __init__(self):
+        self.loop = None
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        if self.loop is not loop or self.loop.is_closed():
+            raise RuntimeError("Event loop is closed")
+        self.calls += 1
+        return SimpleNamespace(text=f"Recommendation {self.calls}", usage_metadata=None)
+
+
+def make_analysis():
+    return pd.DataFrame([{
+        'Ticker': f"{symbol}.KAR", 'Current Price': 100.0 + i, 'Summary': 'BUY',
+        'RSI': 50.0 + i, 'MACD': 1.0, 'MACD Signal': 0.5, 'ADX': 20.0, 'Volume': 1e5,
+    } for i, symbol in enumerate(['LUCK', 'HUBC', 'MEBL', 'OGDC'])])
+
+
+def make_closes(tickers, days=30):
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0, 0.02, size=(days, len(tickers)))
+    return pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), columns=tickers,
+                        index=pd.date_range('2024-01-01', periods=days, freq='B'))
+
+
+def test_consecutive_assessments_share_the_async_client(monkeypatch):
+    model = LoopBoundModel()
+    monkeypatch.setattr(ai_agent, 'model', model)
+    monkeypatch.setattr(pipeline, 'shared_cache', SharedCache(InMemoryBackend()))
+
+    async def analysis():
+        return make_analysis()
+    monkeypatch.setattr(pipeline, 'get_kmi30_analysis_async', analysis)
+
+    async def history(tickers):
+        return make_closes(tickers)
+    monkeypatch.setattr(pipeline, 'get_price_history_async', history)
+
+    # Different answers so the second assessment is not served from the cache
+    _, first = pipeline.run_assessment('moderate', {1: 2, 2: 2, 3: 2, 4: 2, 5: 2})
+    _, second = pipeline.run_assessment('moderate', {1: 3, 2: 2, 3: 2, 4: 2, 5: 2})
+
+    assert not first.startswith(ai_agent.ERROR_PREFIX)
+    assert not second.startswith(ai_agent.ERROR_PREFIX)
+    assert model.calls == 2
+
+
+def test_stage_timeout_returns_without_waiting_for_worker_threads(monkeypatch):
+    import time
+
+    monkeypatch.setattr(pipeline, 'shared_cache', SharedCache(InMemoryBackend()))
+
+    async def slow_analysis():
+        return await asyncio.to_thread(time.sleep, 3)
+    monkeypatch.setattr(pipeline, 'get_kmi30_analysis_async', slow_analysis)
+    monkeypatch.setattr(pipeline.get_shared_kmi30_analysis_async, '__defaults__', (0.5,))
+
+    start = time.perf_counter()
+    with pytest.raises(pipeline.StageTimeout):
+        pipeline.run_assessment('moderate', {1: 2})
+    assert time.perf_counter() - start < 2
+
+
+def test_analysis_callback_gets_daily_closes_before_the_ai_stage(monkeypatch):
+    monkeypatch.setattr(ai_agent, 'model', LoopBoundModel())
+    monkeypatch.setattr(pipeline, 'shared_cache', SharedCache(InMemoryBackend()))
+
+    async def analysis():
+        return make_analysis()
+    monkeypatch.setattr(pipeline, 'get_kmi30_analysis_async', analysis)
+
+    requested = []
+
+    async def history(tickers):
+        requested.append(tickers)
+        return make_closes(tickers)
+    monkeypatch.setattr(pipeline, 'get_price_history_async', history)
+
+    received = []
+    pipeline.run_assessment('moderate', {1: 2}, on_analysis=lambda df, closes: received.append(closes))
+
+    assert requested == [['LUCK', 'HUBC', 'MEBL', 'OGDC']]
+    assert list(received[0].columns) == ['LUCK', 'HUBC', 'MEBL', 'OGDC']
@@ -0,0 +1,36 @@
+import asyncio
+import threading
+import pytest
+
+import async_runner
+import profiling
+from profiling import profile, profiled
+
+
+def test_profile_attaches_workers_but_not_the_shared_loop(monkeypatch):
+    monkeypatch.setattr(profiling.profile_store, 'save', lambda profiler: None)
+    attached = []
+    original = profiling.SamplingProfiler.attach
+    monkeypatch.setattr(profiling.SamplingProfiler, 'attach',
+                        lambda self, ident: (attached.append(ident), original(self, ident)))
+
+    @profiled
+    def blocking_work():
+        return threading.get_ident()
+
+    async def stage():
+        await asyncio.sleep(0.05)
+        return await asyncio.to_thread(blocking_work), threading.get_ident()
+
+    with profile("test"):
+        worker, loop_thread = async_runner.run(stage())
+
+    assert worker in attached
+    assert loop_thread not in attached
+
+
+def test_profiled_rejects_coroutine_functions():
+    with pytest.raises(TypeError):
+        @profiled
+        async def stage():
+            pass
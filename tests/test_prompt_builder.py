@@ -0,0 +1,112 @@
+import os
+from types import SimpleNamespace
+import pytest
+
+import prompt_builder
+from prompt_builder import (
+    build_prompt, estimate_tokens, get_output_preset, format_compact_table,
+    CONDENSED_GUIDELINES, FULL_GUIDELINES, MAX_STOCK_ROWS,
+)
+
+PROFILE = {'Investment Goal': 'Long-term Growth', 'Time Horizon': 'Long-term (5-10 years)'}
+
+
+def stocks(n):
+    return [{
+        'Ticker': f"T{i:02d}.KAR", 'Sector': 'Cement', 'Current Price': 100 + i, 'Summary': 'BUY',
+        'RSI': 55.5, 'MACD': 1.25, 'MACD Signal': 0.75, 'ADX': 22, 'Volume': 1.5e6,
+    } for i in range(n)]
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_compact_table_abbreviates_cells():
+    table = format_compact_table([{'Ticker': 'LUCK.KAR', 'Summary': 'STRONG_BUY', 'RSI': 'N/A', 'Volume': 2.5e6}])
+    assert table.splitlines()[-1] == "LUCK|-|-|SB|-|-|-|-|2.5M"
+
+
+def test_generous_budget_keeps_all_rows_and_full_guidelines():
+    built = build_prompt('moderate', PROFILE, stocks(20), token_budget=100000)
+
+    assert built['stock_rows'] == MAX_STOCK_ROWS
+    assert not built['condensed'] and FULL_GUIDELINES in built['prompt']
+    assert built['prompt_tokens'] == estimate_tokens(built['prompt'])
+
+
+def test_rows_are_trimmed_to_the_budget():
+    full = build_prompt('moderate', PROFILE, stocks(15), token_budget=100000)
+    budget = full['prompt_tokens'] - 1
+    built = build_prompt('moderate', PROFILE, stocks(15), token_budget=budget)
+
+    assert 1 <= built['stock_rows'] < 15
+    assert built['prompt_tokens'] <= budget
+    # One more row would not have fitted
+    more = build_prompt('moderate', PROFILE, stocks(built['stock_rows'] + 1), token_budget=100000)
+    assert more['prompt_tokens'] > budget
+    assert "T14" not in built['prompt']
+
+
+def test_condensed_guidelines_when_the_full_ones_leave_no_room():
+    one_row = build_prompt('moderate', PROFILE, stocks(1), token_budget=100000)
+    built = build_prompt('moderate', PROFILE, stocks(10), token_budget=one_row['prompt_tokens'] - 1)
+
+    assert built['condensed']
+    assert CONDENSED_GUIDELINES in built['prompt'] and FULL_GUIDELINES not in built['prompt']
+
+
+def test_at_least_one_row_is_always_sent():
+    built = build_prompt('moderate', PROFILE, stocks(5), token_budget=10)
+    assert built['stock_rows'] == 1 and built['condensed']
+
+
+def test_custom_token_counter_drives_the_budget():
+    # Counting every prompt as twice the estimate halves the rows that fit
+    budget = build_prompt('moderate', PROFILE, stocks(15), token_budget=100000)['prompt_tokens']
+    built = build_prompt('moderate', PROFILE, stocks(15), token_budget=budget,
+                         count_tokens=lambda text: estimate_tokens(text) * 2)
+    assert built['prompt_tokens'] <= budget and built['stock_rows'] < 15
+
+
+def test_output_presets_follow_the_profile_unless_overridden(monkeypatch):
+    monkeypatch.delenv("OUTPUT_PRESET", raising=False)
+    assert get_output_preset('conservative')['name'] == 'brief'
+    assert get_output_preset('unknown')['name'] == 'standard'
+    monkeypatch.setenv("OUTPUT_PRESET", "detailed")
+    assert get_output_preset('conservative')['max_output_tokens'] == 2000
+
+
+def test_record_call_reports_token_counting_time():
+    stats = prompt_builder.record_call(100, 50, 1.2, 'brief', 3, count_latency=0.25)
+    assert stats['count_latency'] == 0.25
+    assert prompt_builder.get_call_stats()[-1] is stats
+
+
+def test_exact_count_is_only_requested_near_the_budget(monkeypatch):
+    pytest.importorskip("pandas")
+    pytest.importorskip("google.generativeai")
+    os.environ.setdefault("GEMINI_API_KEY", "test")
+    import pandas as pd
+    import ai_agent
+
+    calls = []
+
+    class Model:
+        def count_tokens(self, prompt):
+            calls.append(prompt)
+            return SimpleNamespace(total_tokens=estimate_tokens(prompt))
+
+    monkeypatch.setattr(ai_agent, 'model', Model())
+    ai_agent.count_prompt_tokens.cache_clear()
+    data = pd.DataFrame(stocks(2))
+
+    monkeypatch.setattr(ai_agent, 'DEFAULT_TOKEN_BUDGET', 100000)
+    built = ai_agent.build_recommendation_prompt('moderate', data, {1: 3})
+    assert calls == [] and built['count_latency'] == 0.0
+
+    monkeypatch.setattr(ai_agent, 'DEFAULT_TOKEN_BUDGET', built['prompt_tokens'])
+    built = ai_agent.build_recommendation_prompt('moderate', data, {1: 3})
+    assert calls == [built['prompt']] and built['count_latency'] >= 0.0
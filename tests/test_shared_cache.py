@@ -0,0 +1,37 @@
+import os
+import stat
+import pytest
+
+import shared_cache
+
+
+def mode(path):
+    return stat.S_IMODE(os.lstat(path).st_mode)
+
+
+def test_private_cache_dir_is_only_accessible_to_its_owner(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    directory = shared_cache.private_cache_dir()
+    assert directory == str(tmp_path / "shariastockpro")
+    assert mode(directory) == 0o700
+
+    os.chmod(directory, 0o777)
+    shared_cache.private_cache_dir()
+    assert mode(directory) == 0o700
+
+
+def test_private_cache_dir_rejects_a_planted_symlink(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    (tmp_path / "elsewhere").mkdir()
+    os.symlink(tmp_path / "elsewhere", tmp_path / "shariastockpro")
+    with pytest.raises(PermissionError):
+        shared_cache.private_cache_dir()
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="needs root to create another user's directory")
+def test_private_cache_dir_rejects_another_users_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    (tmp_path / "shariastockpro").mkdir(mode=0o700)
+    os.chown(tmp_path / "shariastockpro", 12345, 12345)
+    with pytest.raises(PermissionError):
+        shared_cache.private_cache_dir()
@@ -0,0 +1,77 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from fundamentals import FundamentalsTable, FIELDS
+from smart_beta import SmartBetaEngine, price_factors
+
+
+def make_table(symbols):
+    n = len(symbols)
+    columns = {field: np.full(n, 10.0) for field in FIELDS}
+    return FundamentalsTable(np.array(symbols), np.array(symbols), columns, 'test')
+
+
+def test_price_factors_use_the_lookback_window():
+    days = pd.date_range('2024-01-01', periods=200, freq='B')
+    closes = pd.DataFrame({
+        'UP': np.linspace(100, 200, 200),
+        'SHORT': [np.nan] * 190 + list(np.linspace(100, 110, 10)),
+    }, index=days)
+    factors = price_factors(closes, lookback=100)
+
+    assert factors['symbols'] == ['UP']
+    assert factors['momentum'][0] == pytest.approx((200 / closes['UP'].iloc[-101] - 1) * 100)
+    assert factors['volatility'][0] > 0
+
+
+def test_update_from_closes_reranks_momentum_once_per_history():
+    engine = SmartBetaEngine(make_table(['LUCK', 'HUBC', 'MEBL']))
+    before = [r['stock']['symbol'] for r in engine.get_stock_recommendations('aggressive')]
+
+    days = pd.date_range('2024-01-01', periods=60, freq='B')
+    closes = pd.DataFrame({
+        'LUCK': np.linspace(100, 90, 60),
+        'HUBC': np.linspace(100, 100, 60),
+        'MEBL': np.linspace(100, 130, 60),
+    }, index=days)
+
+    assert engine.update_from_closes(closes)['rows'] == 3
+    assert engine.update_from_closes(closes)['rows'] == 0
+    after = [r['stock']['symbol'] for r in engine.get_stock_recommendations('aggressive')]
+
+    assert before == ['LUCK', 'HUBC', 'MEBL']
+    assert after[0] == 'MEBL'
+    assert engine.scores.stock(2)['momentum'] == pytest.approx(30.0)
+
+
+def test_rankings_stay_consistent_while_prices_update():
+    import threading
+
+    rng = np.random.default_rng(3)
+    symbols = [f"S{i:03d}" for i in range(300)]
+    engine = SmartBetaEngine(make_table(symbols))
+    engine.get_stock_recommendations('aggressive')
+    done = threading.Event()
+    errors = []
+
+    def update():
+        for _ in range(200):
+            chosen = list(rng.choice(symbols, 20, replace=False))
+            engine.update_prices(chosen, momentum=rng.uniform(-20, 40, 20), volatility=rng.uniform(5, 30, 20))
+        done.set()
+
+    def read():
+        while not done.is_set():
+            scores = [r['score'] for r in engine.get_stock_recommendations('aggressive', len(symbols))]
+            if len(scores) != len(symbols) or any(a < b for a, b in zip(scores, scores[1:])):
+                errors.append(scores)
+                return
+
+    threads = [threading.Thread(target=update)] + [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors